@@ -0,0 +1,133 @@
+import time
+
+
+# ant system configuration
+# the hyperparameters and the stopping rules of a run in one object, shared by ant_system and parallel_colonies
+# a run stops after t_max iterations, or earlier once the time budget is used up, once the best path length has not
+# improved for a number of iterations (the colony has stagnated) or once a path of the target length has been found
+
+
+class AntSystemConfig():
+
+
+    def __init__(self, t_max=10, n_k=10, rho=0.3, n_e=3, Q=2, alpha=1, beta=5, time_budget=None, stagnation=None, target_length=None, max_walk_length=None, initial_pheromone=1.0):
+        self.t_max = t_max # more iterations seem to help for longest path (None to run until another rule stops it)
+        self.n_k = n_k # number of ants - more ants helps with exploration
+        self.rho = rho # evaporation rate
+        self.n_e = n_e # strength of elitest force
+        self.Q = Q # positive constant for use in pheromone update
+        self.alpha = alpha # influence of pheromone
+        self.beta = beta # influence of heuristic information
+        self.time_budget = time_budget # wall clock seconds, checked after every iteration (None for no limit)
+        self.stagnation = stagnation # iterations without a longer path before stopping (None for no limit)
+        self.target_length = target_length # full path length (pixels) that is good enough (None for no target)
+        self.max_walk_length = max_walk_length # steps an ant may take in one iteration before giving up (None for no limit)
+        self.initial_pheromone = initial_pheromone # every edge is reset to this at the start of a run
+
+
+
+    def copy(self, **changes):
+
+        """
+        Copy of the configuration with some values changed, e.g. config.copy(n_k=20).
+
+        Arguments:
+        - Values to change, by name
+
+        Returns:
+        - AntSystemConfig
+        """
+
+        values = dict(vars(self))
+        for name in changes:
+            if name not in values:
+                raise TypeError("Unknown ant system setting: {}".format(name))
+        values.update(changes)
+
+        return AntSystemConfig(**values)
+
+
+
+    def has_stopping_rule(self):
+
+        """
+        Whether a run with this configuration ever stops on its own.
+
+        Returns:
+        - True if t_max, time_budget, stagnation or target_length is set
+        """
+
+        return any(value is not None for value in [self.t_max, self.time_budget, self.stagnation, self.target_length])
+
+
+
+    def __repr__(self):
+
+        return "AntSystemConfig({})".format(", ".join("{}={!r}".format(name, value) for name, value in vars(self).items()))
+
+
+
+
+class StopCondition():
+
+
+    def __init__(self, config):
+        self.config = config
+        self.start = time.perf_counter()
+        self.iterations = 0
+        self.since_improvement = 0
+        self.best_path_length = 0
+        self.reason = None # why the run stopped, once it has
+
+
+
+    def update(self, best_path_length, iterations=1):
+
+        """
+        Records the iterations just run and decides whether the run is over.
+
+        Arguments:
+        - Full length of best path found so far, specified in terms of pixel ids
+        - Number of iterations run since the last update
+
+        Returns:
+        - True if the run should stop (the reason is kept in self.reason)
+        """
+
+        self.iterations += iterations
+        if(best_path_length > self.best_path_length):
+            self.best_path_length = best_path_length
+            self.since_improvement = 0
+        else:
+            self.since_improvement += iterations
+
+        config = self.config
+        if(config.target_length is not None and self.best_path_length >= config.target_length):
+            self.reason = 'target_length'
+        elif(config.t_max is not None and self.iterations >= config.t_max):
+            self.reason = 't_max'
+        elif(config.stagnation is not None and self.since_improvement >= config.stagnation):
+            self.reason = 'stagnation'
+        elif(config.time_budget is not None and time.perf_counter() - self.start >= config.time_budget):
+            self.reason = 'time_budget'
+
+        return self.reason is not None
+
+
+
+    def remaining_iterations(self, iterations):
+
+        """
+        Caps a number of iterations at what is left of t_max.
+
+        Arguments:
+        - Number of iterations wanted
+
+        Returns:
+        - Number of iterations to run
+        """
+
+        if(self.config.t_max is None):
+            return iterations
+
+        return max(min(iterations, self.config.t_max - self.iterations), 0)
@@ -1,9 +1,20 @@
 
 # ant system (AS) -longest path problem
 
+import itertools
+import sys
 from PIL import Image
 import numpy as np
 from tree import Node, Tree
+from graph import Graph, as_graph
+import render
+from packed_maze import PackedMaze, load_packed_maze
+from graph_cache import load_graph
+from tabu import TabuBitset
+from transitions import TransitionCache
+from random_blocks import RandomBlocks
+from telemetry import Telemetry, print_record
+from ant_config import AntSystemConfig, StopCondition
 
 
 
@@ -11,73 +22,54 @@ from tree import Node, Tree
 
 
 # The transition probability used by AS is a balance between pheromone intensity and heuristic information. 
-# The balance is controlled byalpha and beta
-def transition_probability(parent, child, transition_sum, alpha, beta):
-
-    """
-    Calculates the probability of ant k moving to specified child node depending on pheromone and heuristic information.
-
-    Arguments:
-    - Parent node where ant is currently situated
-    - Child node that ant is considering moving to
-    - Sum of all transition probabilities for all possible moves
-    - Alpha parameter controlling influence of pheromone
-    - Beta parameter controlling influence of heuristic information
-
-    Returns:
-    - Transition probability for given child node
-    """
-
-    prob = (np.power(parent.pheromone[child.location_id], alpha)*np.power(child.heuristic_info, beta))/transition_sum
-
-    return prob
+# The balance is controlled byalpha and beta - the weights are cached per edge in TransitionCache (transitions.py)
 
 
 
 
-
-
-
-def remove_loops(path):
+def select_moves(cumulative, valid, r):
 
     """
-    Removes loops from the given path to ensure only simple paths are found.
+    Roulette wheel selection of one candidate for every ant at once.
 
     Arguments:
-    - Path found by an individual ant
+    - Cumulative transition probabilities for each ant (ants x max out-degree)
+    - Mask of valid candidates
+    - Random numbers sampled uniformly between 0 and 1, one per ant
 
     Returns:
-    - Path with any repeated nodes removed
+    - Index of the chosen candidate for each ant
     """
 
-    new_path = []
-    i = 0
-    while i < len(path):
+    num_ants, width = cumulative.shape
+    rows = np.arange(num_ants)
+
+    # offset each row by its index so all rows can be searched in one sorted array
+    # the first candidate whose region reaches r is chosen
+    chosen = np.searchsorted((cumulative + rows[:, None]).ravel(), rows + r, side='left') - rows*width
+
+    # rounding can leave the top of the last region just below r, and with many ants the row offsets make the sums
+    # coarse enough that a draw near 0 lands on a zero-width slot in front of the first valid candidate
+    first_valid = np.argmax(valid, axis=1)
+    last_valid = width - 1 - np.argmax(valid[:, ::-1], axis=1)
+
+    return np.clip(chosen, first_valid, last_valid)
 
-        # search from just after current index
-        for t in range(12):
 
-            try:     
-                index = path.index(path[i], i+1) # find the next index that matches
-                del path[i+1:index+1]
 
-            except ValueError as ve:
-                if(i == 0):
-                    print("no loop")
-        
-        i+=1
 
 
 
 
-def local_pheromone_update(tree, ant_paths, best_path, best_path_length, Q):
+def local_pheromone_update(graph, ant_paths, path_lengths, best_path, best_path_length, Q):
 
     """
     Performs local pheromone update on each link in the path for each ant and updates longest path
 
     Arguments:
-    - Tree of nodes built from maze
-    - Array of current paths found by ants in population
+    - Graph built from maze
+    - Array of current paths found by ants in population, specified in terms of node ids
+    - Full length of each ant's path, specified in terms of pixel ids
     - Longest path found overall, specified in terms of node ids
     - Full length of best path, specified in terms of pixel ids
     - Positive constant for use in pheromone update
@@ -86,39 +78,35 @@ def local_pheromone_update(tree, ant_paths, best_path, best_path_length, Q):
     - Best path found and full length of best path
     """
 
-    # retrace ant paths and deposit pheromone
-    pheromone_delta = 0
-    #for k in range(len(ant_positions)):
     for k in range(len(ant_paths)):
-        # path length in number of nodes
-        path_length = len(ant_paths[k])
-        # find full path length
-        full_path = build_full_path(tree, ant_paths[k]) 
-        flat_full_path = [item for sublist in full_path for item in sublist]
-        print("Path Length: {}".format(len(flat_full_path)))
-        full_path_length = len(flat_full_path)
+        full_path_length = int(path_lengths[k])
         # update best solution (longest path)
         if (full_path_length > best_path_length): 
             best_path = ant_paths[k]
             best_path_length = full_path_length
-        for i in range(path_length-1):
-            # edge between ant_paths[k][i], ant_paths[k][i+1]
-            src_vertex = tree.nodes[ant_paths[k][i]]
-            child_id = [c for c in src_vertex.children.keys() if c == ant_paths[k][i+1]][0]
-            src_vertex.pheromone[child_id] += Q*path_length # should this be full path length instead??
+
+    if(len(ant_paths) == 0): # every ant gave up
+        return best_path, best_path_length
+
+    # retrace ant paths and deposit pheromone on every edge of every path in one go
+    # each ant deposits Q times its path length in number of nodes
+    sources = np.concatenate([p[:-1] for p in ant_paths])
+    dests = np.concatenate([p[1:] for p in ant_paths])
+    deposits = np.repeat([Q*len(p) for p in ant_paths], [len(p) - 1 for p in ant_paths]) # should this be full path length instead??
+    np.add.at(graph.pheromone, graph.find_edges(sources.astype(np.int64), dests), deposits)
     
     return best_path, best_path_length
 
 
 
 
-def global_pheromone_update(tree, best_path_length, Q, rho, n_e):
+def global_pheromone_update(graph, best_path_length, Q, rho, n_e):
 
     """
-    Iterate through all edges and apply evaporation rate and elitest best path update
+    Apply evaporation rate and elitest best path update to all edges at once
 
     Arguments:
-    - Tree of nodes built from maze
+    - Graph built from maze
     - Full length of best path, specified in terms of pixel ids
     - Positive constant for use in pheromone update
     - Evaporation rate
@@ -126,171 +114,333 @@ def global_pheromone_update(tree, best_path_length, Q, rho, n_e):
 
     """
 
-    for i in tree.nodes.keys():
-        current_vertex = tree.nodes[i]
-        # get this indexing right
-        for j in current_vertex.children.keys():
-                current_vertex.pheromone[j] = ((1-rho)*current_vertex.pheromone[j]) + (n_e*(Q*best_path_length))
+    graph.pheromone *= (1-rho)
+    graph.pheromone += (n_e*(Q*best_path_length))
 
 
 
 
 
 
-def ant_system(tree, maze_array):
+def construct_ant_paths(graph, n_k, ant_tabu, alpha, beta, rng=np.random, cache=None, telemetry=None, max_walk_length=None):
 
     """
-    Runs ant system for the given maze to find the longest path between the start and end.
+    Moves n_k ants from the entrance until every ant has reached the exit. All ants are moved together at every step.
+    Ants whose walk reaches max_walk_length steps before they find the exit give up and are left out of the result, as
+    are ants that backtrack past the entrance (the exit cannot be reached from the nodes left to them).
 
     Arguments:
-    - Tree of nodes built from maze
-    - Maze in array form
+    - Graph built from maze
+    - Number of ants
+    - Tabu bitset with a row for each ant (empty on entry, emptied again on exit)
+    - Alpha parameter controlling influence of pheromone
+    - Beta parameter controlling influence of heuristic information
+    - Random number generator (numpy.random module, Generator or RandomBlocks)
+    - Transition weights refreshed from the current pheromone (optional, built here if not given)
+    - Telemetry counting the moves, backtracks and abandoned ants (optional)
+    - Most steps (moves and backtracks) an ant may take before giving up (None for no limit)
 
     Returns:
-    - Longest path found during beam search, specified in node location ids
+    - Paths of the ants that reached the exit, with the backtracking cut out, specified in node ids
+    - Full length of each of those paths, specified in terms of pixel ids
     """
 
-    # init hyperparameters
+    edge_table = graph.padded_edges()
+    if cache is None:
+        cache = TransitionCache(graph, alpha, beta)
+        cache.refresh()
+
+    # get exit and start nodes
+    final_ant_location_id = graph.end
+    start_ant_location_id = graph.start
+
+    # nk ants are placed at the source node.
+    # need to store whole path of ant as well 
+    ant_positions = np.full(n_k, start_ant_location_id, dtype=np.int64) # start at entrance node (ant_pos is the node id)
+    ant_tabu.add(np.arange(n_k), np.full(n_k, start_ant_location_id)) # initialise tabu lists
+    ant_visited = [[start_ant_location_id] for i in range(n_k)] # nodes added to each tabu list, to clear them afterwards
+
+    # running full path length of each ant (pixels, including the entrance)
+    ant_lengths = np.ones(n_k, dtype=np.int64)
+
+    # depth first search stack of each ant - the walk with its loops erased, one (node id, full length so far, cursor)
+    # frame per node, where the candidate edges before the cursor are known to lead to visited nodes
+    # visited nodes never leave the tabu list, so a cursor only ever moves forward and every candidate of a frame is
+    # checked at most once however often the ant backtracks through it
+    ant_stacks = [[(start_ant_location_id, 1, 0)] for i in range(n_k)]
+
+    walk_steps = np.zeros(n_k, dtype=np.int64)
+    abandoned = np.zeros(n_k, dtype=bool)
+
+    active = np.flatnonzero(ant_positions != final_ant_location_id)
+    while(len(active) > 0): # until all ants have reached the exit
+
+        # Each ant must then attempt to construct a path from the source to the destination using the transition probability
+        # A list of all visited nodes are stored in a tabu list. Specically the sets Nk i will exclude any node on the tabu list.
+        candidate_edges = edge_table[ant_positions[active]]
+        valid = (candidate_edges >= 0)
+        valid &= ~ant_tabu.contains(active[:, None], graph.targets[candidate_edges])
+        can_move = valid.any(axis=1)
+        if telemetry is not None:
+            telemetry.count('backtracks', len(active) - np.count_nonzero(can_move))
+
+        # if ant reaches dead end, backtrack to previous node and try new direction
+        for k in active[~can_move]:
+
+            # pop frames until one has an unexplored direction left (the dead end itself has none)
+            stack = ant_stacks[k]
+            stack.pop()
+            while stack:
+                node, length, cursor = stack[-1]
+                remaining = edge_table[node, cursor:]
+                unexplored = (remaining >= 0) & ~ant_tabu.contains(k, graph.targets[remaining])
+                if unexplored.any():
+                    stack[-1] = (node, length, cursor + int(np.argmax(unexplored)))
+                    break
+                stack.pop()
+
+            # backtracked past the entrance - every node the ant can still reach has been visited without finding the exit
+            if not stack:
+                abandoned[k] = True
+                if telemetry is not None:
+                    telemetry.count('abandoned')
+                continue
+
+            # move back to that node - doesn't need to go through transition prob since only one option
+            ant_positions[k] = node
+
+            # the loop back to this node will be cut, so the length goes back to what it was when the ant was last here
+            ant_lengths[k] = length
+
+        # move all other ants at once
+        movers = active[can_move]
+        candidate_edges = candidate_edges[can_move]
+        valid = valid[can_move]
+        if(len(movers) > 0):
+            if telemetry is not None:
+                telemetry.count('moves', len(movers))
+            cumulative = cache.probabilities(candidate_edges, valid)
+            r = rng.uniform(0, 1, len(movers)) # generate random numbers sampled uniformly between 0 and 1 
+            chosen = select_moves(cumulative, valid, r)
+            chosen_edges = candidate_edges[np.arange(len(movers)), chosen]
+            new_positions = graph.targets[chosen_edges]
+
+            ant_positions[movers] = new_positions # node id
+            ant_tabu.add(movers, new_positions) # append id 
+            ant_lengths[movers] += graph.lengths[chosen_edges]
+            for k, position, length in zip(movers.tolist(), new_positions.tolist(), ant_lengths[movers].tolist()):
+                ant_visited[k].append(position)
+                ant_stacks[k].append((position, length, 0))
+
+        # ants that have walked too far without finding the exit give up
+        if max_walk_length is not None:
+            walk_steps[active] += 1
+            given_up = active[(walk_steps[active] >= max_walk_length) & (ant_positions[active] != final_ant_location_id) & ~abandoned[active]]
+            abandoned[given_up] = True
+            if telemetry is not None:
+                telemetry.count('abandoned', len(given_up))
+
+        active = np.flatnonzero((ant_positions != final_ant_location_id) & ~abandoned)
+
+
+    # clear only the words holding visited nodes, ready for the next iteration
+    ant_tabu.reset(np.repeat(np.arange(n_k), [len(v) for v in ant_visited]), np.concatenate(ant_visited))
+
+    # the stack of an ant at the exit is its path with the loops already erased
+    finished = np.flatnonzero(~abandoned)
+    ant_paths = [[node for node, length, cursor in ant_stacks[k]] for k in finished]
+
+    return ant_paths, ant_lengths[finished]
+
+
+
+
+def colony_iterations(graph, config, best_path, best_path_length, rng=np.random, telemetry=None):
 
-    t = 0
-    t_max = 10 # more iterations seem to help for longest path
-    n_k = 10 # number of ants - more ants helps with exploration
+    """
+    Runs iterations of ant system on the graph for as long as the caller keeps asking, updating its pheromone in place.
 
-    rho = 0.3
-    n_e = 3 #2
-    Q = 2
-    alpha = 1
-    beta = 5
-    
+    Arguments:
+    - Graph built from maze
+    - AntSystemConfig with the hyperparameters (its stopping rules are left to the caller)
+    - Longest path found so far, specified in node ids
+    - Full length of longest path found so far, specified in terms of pixel ids
+    - Random number generator (numpy.random module or Generator)
+    - Telemetry receiving the phase times and counters of every iteration (optional, see telemetry.py)
+
+    Yields:
+    - Longest path found so far (node ids) and its full length, after every iteration
+    """
 
-    best_path = []
-    best_path_length = 0
+    n_k, rho, n_e, Q, alpha, beta = config.n_k, config.rho, config.n_e, config.Q, config.alpha, config.beta
 
+    ant_tabu = TabuBitset(n_k, graph.num_nodes) # tabu lists, one bit per node for each ant
+    cache = TransitionCache(graph, alpha, beta) # heuristic factors are computed once here
+    cache.refresh()
+    random = RandomBlocks(rng, block_size=n_k*1024) # random numbers for the moves, drawn a block at a time
 
-    # assign a small amount of pheromone to all links T_ij -> done during construction fo graph 
+    while True:
 
-    # get exit location
-    [r, c] = tree.end_location
-    final_ant_location_id = r*len(maze_array[0]) + c
+        if telemetry is not None:
+            telemetry.start_iteration()
+        ant_paths, path_lengths = construct_ant_paths(graph, n_k, ant_tabu, alpha, beta, random, cache, telemetry, config.max_walk_length)
+        if telemetry is not None:
+            telemetry.mark('construction')
 
-    # get start location
-    [r, c] = tree.start_location
-    start_ant_location_id = r*len(maze_array[0]) + c
+        # apply pheromone update
+        # Once all ants have constructed a complete path from the origin node to the destination node (without loops, as they are cut while backtracking), 
+        # each ant retraces its path to the source node deterministically, and deposits a pheromone amount
+        # local pheromone update
+        # retrace ant paths and deposit pheromone, calculate longest path
+        best_path, best_path_length = local_pheromone_update(graph, ant_paths, path_lengths, best_path, best_path_length, Q)
+        if telemetry is not None:
+            telemetry.mark('deposit')
 
 
-    while (t < t_max):
+        # global pheromone update
+        # If the pheromone trail lasted forever it is likely that paths will become over saturated, and force the ants to over exploit found solutions.
+        # To avoid this an evaporation rate is added before the ants lay new pheromone trails the current pheromone level is updated 
+        global_pheromone_update(graph, best_path_length, Q, rho,  n_e)
 
-        # nk ants are placed at the source node.
-        # need to store whole path of ant as well 
-        ant_positions = [start_ant_location_id for i in range(n_k)] # start at entrance node (ant_pos is the location id)
-        ant_tabu_lists = [[start_ant_location_id] for i in range(n_k)] # initialise tabu lists
-        ant_paths  = [[start_ant_location_id] for i in range(n_k)] # store ant paths for best solution and backtracking
+        # the pheromone only changes here, so the transition weights are refreshed once per iteration
+        cache.refresh()
+        if telemetry is not None:
+            telemetry.mark('evaporation')
+            telemetry.end_iteration(graph, best_path_length, path_lengths)
 
-        print("Iteration {}".format(t))
+        yield best_path, best_path_length
 
-        while(not(all([ant_pos == final_ant_location_id for ant_pos in ant_positions]))): # until all ants have reached the exit
 
-            #print("Ants making another move")
 
-            # Each ant must then attempt to construct a path from the source to the destination using the transition probability
-            for k in range(len(ant_positions)):
 
-                # don't move ant if it has reached the end, wait for others to finish
-                if(ant_positions[k] == final_ant_location_id):
-                    continue 
+def run_colony(graph, iterations, config, best_path, best_path_length, rng=np.random, telemetry=None):
 
-                # A list of all visited nodes are stored in a tabu list. Specically the sets Nk i will exclude any node on the tabu list.
-                current_node = ant_positions[k]
-                current_vertex = tree.nodes[ant_positions[k]]
-                tabu_list = [start_ant_location_id, current_node]
-                routes = tree.pixel_routes[current_node]
-                valid_routes_outer = [n for n in routes if (n[0]*len(maze_array[0]) + n[1]) not in tabu_list]
-                children, lasts = tree.find_paths(current_node, valid_routes_outer, maze_array, tabu_list) # find children dynamically
-                possible_children_ids = current_vertex.children.keys() 
+    """
+    Runs a fixed number of iterations of ant system on the graph, updating its pheromone in place.
 
-                # take out items on the tabu list for this ant
-                children = [tree.nodes[c] for c in possible_children_ids if c not in ant_tabu_lists[k]]
+    Arguments:
+    - Graph built from maze
+    - Number of iterations
+    - AntSystemConfig with the hyperparameters
+    - Longest path found so far, specified in node ids
+    - Full length of longest path found so far, specified in terms of pixel ids
+    - Random number generator (numpy.random module or Generator)
+    - Telemetry receiving the phase times and counters of every iteration (optional, see telemetry.py)
 
-                # if ant reaches dead end, backtrack to previous node and try new direction
-                if(len(children) == 0):
+    Returns:
+    - Longest path found (node ids) and its full length
+    """
 
-                    i = 1
-                    children_ids = []
-                    # until you backtrack to node where there is an unexplored direction
-                    while(len(children_ids) == 0):
+    for best_path, best_path_length in itertools.islice(colony_iterations(graph, config, best_path, best_path_length, rng, telemetry), iterations):
+        pass
 
-                        possible_children_ids = tree.nodes[ant_paths[k][-i]].children.keys() 
-                        children_ids = [c for c in possible_children_ids if c not in ant_tabu_lists[k]] # only valid other routes if not already visited - problem if the node that you actually want to move to has been visited subsequently??
-                        i+=1
-                    
-                    i = i - 1
+    return best_path, best_path_length
 
-                    # move back to previous node - need to move back to the previous node where there is another path that you haven't tried -NB otherwise continually going between two nodes
-                    # doesn't need to go through transition prob since only one option
-                    ant_positions[k] = ant_paths[k][-i] # location id of previous node - but problem if this has happened already
-                    ant_tabu_lists[k].append(ant_positions[k]) # append id - is the previous one already added?
-                    ant_paths[k].append(ant_positions[k])
-                    continue 
 
-                
-                transition_sum = np.sum([((current_vertex.pheromone[c.location_id])**alpha)*((c.heuristic_info)**beta) for c in children]) # find sum of probabilities
 
-                # first check if there are edges to move to 
 
-                i = 0 # first neighbour/child
-                p_i = transition_probability(current_vertex, children[i], transition_sum, alpha, beta) # probability of first chromosome
-                summation = p_i # points to the top of the first region
-                r = np.random.uniform(0, 1) # generate random number sampled uniformly between 0 and 1 
-                while (summation < r):
-                    i = i+1
-                    summation = summation + transition_probability(current_vertex, children[i], transition_sum, alpha, beta)
-                
-                ant_positions[k] = children[i].location_id # node id
-                ant_tabu_lists[k].append(ant_positions[k]) # append id 
-                ant_paths[k].append(ant_positions[k])
-            
+def ant_system_anytime(tree, maze_array, config=None, rng=None, telemetry=None):
 
-        # remove loops from paths 
-        print("removing loops")
-        for j in range(len(ant_paths)):
-            remove_loops(ant_paths[j])
+    """
+    Runs ant system as a generator, handing back the longest path found so far after every iteration. The run ends
+    when one of the stopping rules of the configuration is met, or whenever the caller stops asking for more.
 
-        
-        # apply pheromone update
-        # Once all ants have constructed a complete path from the origin node to the destination node, and all loops have been removed, 
-        # each ant retraces its path to the source node deterministically, and deposits a pheromone amount
-        print("update pheromone")
-        # local pheromone update
-        # retrace ant paths and deposit pheromone, calculate longest path
-        best_path, best_path_length = local_pheromone_update(tree, ant_paths, best_path, best_path_length, Q)
+    Arguments:
+    - Tree or Graph of nodes built from maze
+    - Maze in array form
+    - AntSystemConfig (defaults to AntSystemConfig())
+    - Random number generator or seed for reproducible runs (defaults to the global numpy.random state)
+    - Telemetry receiving a record of every iteration (optional, see telemetry.py)
 
+    Yields:
+    - Longest path found so far, specified in node location ids, and its full length
+    """
 
-        # global pheromone update
-        # If the pheromone trail lasted forever it is likely that paths will become over saturated, and force the ants to over exploit found solutions.
-        # To avoid this an evaporation rate is added before the ants lay new pheromone trails the current pheromone level is updated 
-        global_pheromone_update(tree, best_path_length, Q, rho,  n_e)
+    config = config or AntSystemConfig()
 
+    # assign a small amount of pheromone to all links T_ij - reset on every run, so a graph that is reused (e.g. loaded
+    # from the cache or solved before) never starts from the trails of an earlier run
+    graph = as_graph(tree, maze_array)
+    graph.pheromone[:] = config.initial_pheromone
 
-        t += 1
-    
+    if rng is None:
+        rng = np.random
+    elif not isinstance(rng, np.random.Generator):
+        rng = np.random.default_rng(rng)
+
+    stop = StopCondition(config)
+    if(config.t_max == 0):
+        return
+
+    for best_path, best_path_length in colony_iterations(graph, config, [], 0, rng, telemetry):
+        yield graph.location_ids[best_path].tolist(), best_path_length
+        if stop.update(best_path_length):
+            break
+
+
+
+
+def ant_system(tree, maze_array, n_k=None, rng=None, telemetry=None, config=None):
+
+    """
+    Runs ant system for the given maze to find the longest path between the start and end.
+
+    Arguments:
+    - Tree or Graph of nodes built from maze
+    - Maze in array form
+    - Number of ants (overrides config.n_k if given)
+    - Random number generator or seed for reproducible runs (defaults to the global numpy.random state)
+    - Telemetry receiving a record of every iteration (optional, e.g. Telemetry(Recorder()) or
+      Telemetry(JsonLinesWriter('run.jsonl')), see telemetry.py)
+    - AntSystemConfig with the hyperparameters and stopping rules (defaults to AntSystemConfig(), 10 iterations)
+
+    Returns:
+    - Longest path found during beam search, specified in node location ids
+
+    Raises:
+    - ValueError if no ant ever reached the exit (max_walk_length is too low, or the exit cannot be reached at all)
+    """
+
+    config = config or AntSystemConfig()
+    if n_k is not None:
+        config = config.copy(n_k=n_k)
+    if not config.has_stopping_rule():
+        raise ValueError("The run needs a stopping rule - set t_max, time_budget, stagnation or target_length (or use ant_system_anytime)")
+
+    best_path = []
+    for best_path, best_path_length in ant_system_anytime(tree, maze_array, config, rng, telemetry):
+        pass
+
+    # the best path is kept from earlier iterations, so this only happens if every ant of every iteration gave up
+    if(len(best_path) == 0 and config.max_walk_length is not None):
+        raise ValueError("No ant reached the exit within max_walk_length={} steps - raise the limit or set it to None".format(config.max_walk_length))
+    if(len(best_path) == 0):
+        raise ValueError("No ant reached the exit - it cannot be reached from the entrance")
 
     return best_path
 
 
 
 
-def load_maze(filename):
+def load_maze(filename, packed=False):
 
     """
     Loads in maze image and converts to binary array.
 
     Arguments:
     - Filename of maze image
+    - Whether to return a bit-packed maze (one bit per pixel, read from the file a tile at a time when possible)
 
     Returns:
-    - Maze as a numpy array
+    - Maze as a numpy array or PackedMaze
     """
 
+    if packed:
+        try:
+            return load_packed_maze(filename)
+        except ValueError: # not an uncompressed BMP - decode it with PIL and pack it afterwards
+            return PackedMaze.from_array(load_maze(filename))
+
     # Open the maze image and get its dimensions
     maze_image = Image.open(filename)
     w, h = maze_image.size
@@ -306,7 +456,7 @@ def load_maze(filename):
 
 
 
-def draw_path(maze_array, best_path, filename):
+def draw_path(maze_array, best_path, filename, end_colour=None, graph=None):
 
     """
     Draws longest path found in red on original maze image.
@@ -315,50 +465,12 @@ def draw_path(maze_array, best_path, filename):
     - Maze in array form
     - Longest path found, specified using location ids
     - Filename of original maze
+    - RGB colour for the end of a gradient along the path (optional)
+    - Graph whose pheromone is drawn underneath as a heat map (optional)
 
     """
 
-    # convert to RGB format and the save as bmp file
-    filename_results = filename[:-4] + "_result_AS.bmp"
-    filename_2 = filename[:-4] + "_result_AS.png"
-    print(filename_results)
-
-    width = maze_array.shape[0]
-    height = maze_array.shape[1]
-
-    maze_array = maze_array.astype(int).flatten()
-    maze_array[maze_array==1] = 255 
-    
-    # red is 255, 0, 0
-    # mark path with 125
-    for i in range(len(best_path)):
-
-        maze_array[best_path[i]] = 125 # mark path
-
-    
-    maze_length = len(maze_array)
-    image = []
-    for j in range(maze_length):
-
-        # if path, colour in red
-        if (maze_array[j] == 125):
-
-            image.append(255)
-            image.append(0)
-            image.append(0)
-
-        else:
-
-            image.append(maze_array[j])
-            image.append(maze_array[j])
-            image.append(maze_array[j])
-    
-    image = np.array(image, dtype = np.uint8)
-    image = image.reshape((width, height, 3))
-    pil = Image.fromarray(image)
-    pil.save(filename_results)
-
-    pil.save(filename_2, dpi=(300, 300))
+    render.draw_path(maze_array, best_path, filename, "_result_AS", save_png=True, end_colour=end_colour, graph=graph)
 
 
 
@@ -370,13 +482,19 @@ def build_full_path(tree, path):
     From given node location ids, build full path with inbetween pixel locations.
 
     Arguments:
-    - Tree of nodes built from maze
+    - Tree or Graph of nodes built from maze
     - Path found, specified using node location ids
 
     Returns:
-    - Full path containing all pixels between start and end
+    - Full path containing all pixels between start and end (empty if the path is)
     """
 
+    if isinstance(tree, Graph):
+        return tree.build_full_path(path)
+
+    if(len(path) == 0):
+        return []
+
     full_path = [[path[0]]]
     #print(path)
     start = path[0]
@@ -397,13 +515,16 @@ def main():
     
     """
 
-    filename = 'Mazes/Small-Medium1.bmp'
-    maze_array = load_maze(filename)
-    t = Tree(maze_array)
-    best_path = ant_system(t, maze_array)
-
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium1.bmp'
+    maze_array = load_maze(filename, packed=True)
+    g = load_graph(filename, maze_array) # built once per maze, then loaded from the cache
+    try:
+        best_path = ant_system(g, maze_array, telemetry=Telemetry(print_record))
+    except ValueError as error: # no ant reached the exit
+        print(error)
+        return
 
-    full_path = build_full_path(t, best_path)
+    full_path = build_full_path(g, best_path)
     flat_full_path = [item for sublist in full_path for item in sublist]
 
     print("Path Length: {}".format(len(flat_full_path)))
@@ -0,0 +1,191 @@
+# batch solver - runs ant system and/or beam search on every maze in a directory or glob
+
+import argparse
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import resource
+import time
+from multiprocessing import Pool
+from tree import Tree
+from graph import Graph
+from reduction import reduce_graph
+from graph_cache import load_graph
+import ant_system_dynamic
+import beam_search_dynamic
+
+
+
+
+ALGORITHMS = {'as': 'ant_system', 'bs': 'beam_search'}
+SUMMARY_FIELDS = ['maze', 'algorithm', 'path_length', 'wall_time', 'peak_memory_mb', 'result']
+
+
+
+
+def find_mazes(pattern):
+
+    """
+    Finds the maze images to solve.
+
+    Arguments:
+    - Directory containing .bmp mazes, or a glob pattern such as Mazes/*.bmp
+
+    Returns:
+    - Sorted list of maze filenames
+    """
+
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.bmp')
+
+    # never pick up earlier results as new mazes
+    return sorted(f for f in glob.glob(pattern) if '_result_' not in os.path.basename(f))
+
+
+
+
+def solve_maze(task):
+
+    """
+    Solves a single maze with one algorithm and saves the result image. Runs in its own worker process.
+
+    Arguments:
+    - Tuple of maze filename, algorithm ('as' or 'bs'), output directory, whether to show solver output, whether to
+      search the reduced graph and whether to use the graph cache
+
+    Returns:
+    - Summary row for the maze
+    """
+
+    filename, algorithm, output_dir, verbose, reduce, cache = task
+
+    # results are named after the maze but written to the output directory
+    result_name = os.path.join(output_dir, os.path.basename(filename))
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+    start = time.perf_counter()
+    with output:
+        maze_array = ant_system_dynamic.load_maze(filename, packed=True)
+        if cache:
+            g = load_graph(filename, maze_array, reduce)
+        else:
+            g = Graph.from_tree(Tree(maze_array), maze_array)
+            if reduce:
+                g, stats = reduce_graph(g, maze_array)
+
+        if(algorithm == 'as'):
+            try:
+                best_path = ant_system_dynamic.ant_system(g, maze_array)
+            except ValueError as error: # no ant reached the exit
+                print(error)
+                best_path = []
+            full_path = ant_system_dynamic.build_full_path(g, best_path)
+            flat_full_path = [item for sublist in full_path for item in sublist]
+            suffix = None # no image without a path
+            if(len(flat_full_path) > 0):
+                ant_system_dynamic.draw_path(maze_array, flat_full_path, result_name)
+                suffix = "_result_AS.bmp"
+        else:
+            flat_full_path = beam_search_dynamic.beam_search(g, maze_array)
+            beam_search_dynamic.draw_path(maze_array, flat_full_path, result_name)
+            suffix = "_result_BS.bmp"
+    wall_time = time.perf_counter() - start
+
+    # each task gets a fresh worker process, so the process peak is the peak for this maze (ru_maxrss is in KB on Linux)
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+    return {
+        'maze': filename,
+        'algorithm': ALGORITHMS[algorithm],
+        'path_length': len(flat_full_path),
+        'wall_time': round(wall_time, 3),
+        'peak_memory_mb': round(peak_memory, 1),
+        'result': result_name[:-4] + suffix if suffix is not None else None,
+    }
+
+
+
+
+def write_summary(rows, output_dir):
+
+    """
+    Writes the summary rows to summary.json and summary.csv in the output directory.
+
+    Arguments:
+    - Summary rows, one per maze and algorithm
+    - Output directory
+    """
+
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(rows, f, indent=2)
+
+    with open(os.path.join(output_dir, 'summary.csv'), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+
+
+def batch_solve(pattern, algorithm='both', output_dir='Solved_Mazes', workers=None, verbose=False, reduce=False, cache=True):
+
+    """
+    Solves every maze matching the pattern concurrently in a process pool.
+
+    Arguments:
+    - Directory or glob pattern of mazes
+    - Algorithm to run: 'as', 'bs' or 'both'
+    - Directory for result images and the summary
+    - Number of worker processes (defaults to the number of cores)
+    - Whether to show solver output
+    - Whether to search the reduced graph, without dead ends and side components (see reduction.py)
+    - Whether to load graphs built by earlier runs from the graph cache (see graph_cache.py)
+
+    Returns:
+    - Summary rows, one per maze and algorithm
+    """
+
+    algorithms = ['as', 'bs'] if algorithm == 'both' else [algorithm]
+    tasks = [(f, a, output_dir, verbose, reduce, cache) for f in find_mazes(pattern) for a in algorithms]
+    os.makedirs(output_dir, exist_ok=True)
+
+    rows = []
+    # one task per process so that the peak memory of each maze is measured on its own
+    with Pool(workers, maxtasksperchild=1) as pool:
+        for row in pool.imap_unordered(solve_maze, tasks):
+            print("{} ({}): path length {}, {:.2f}s, {:.1f} MB".format(row['maze'], row['algorithm'], row['path_length'], row['wall_time'], row['peak_memory_mb']))
+            rows.append(row)
+
+    rows.sort(key=lambda row: (row['maze'], row['algorithm']))
+    write_summary(rows, output_dir)
+
+    return rows
+
+
+
+
+def main():
+
+    """
+    Command line entry point, e.g. python3 batch_solve.py "Mazes/*.bmp" --algorithm both --workers 4
+
+    """
+
+    parser = argparse.ArgumentParser(description="Solve every maze in a directory or glob with ant system and/or beam search.")
+    parser.add_argument('mazes', help="directory of .bmp mazes or a glob pattern such as 'Mazes/*.bmp'")
+    parser.add_argument('--algorithm', choices=['as', 'bs', 'both'], default='both', help="ant system, beam search or both")
+    parser.add_argument('--output-dir', default='Solved_Mazes', help="where result images and summary.json/summary.csv are written")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: number of cores)")
+    parser.add_argument('--verbose', action='store_true', help="show the solvers' own output")
+    parser.add_argument('--reduce', action='store_true', help="search the reduced graph, without dead ends and side components")
+    parser.add_argument('--no-cache', action='store_true', help="always build the graphs instead of loading them from the graph cache")
+    args = parser.parse_args()
+
+    batch_solve(args.mazes, args.algorithm, args.output_dir, args.workers, args.verbose, args.reduce, not args.no_cache)
+
+
+if __name__ == "__main__":
+    main()
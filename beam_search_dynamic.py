@@ -1,8 +1,18 @@
 # beam search - longest path
 
+import sys
+import heapq
+from collections import deque
+from itertools import chain, groupby
+from operator import itemgetter
 from PIL import Image
 import numpy as np
 from tree import Node, Tree
+from graph import Graph, as_graph
+import render
+from packed_maze import PackedMaze, load_packed_maze
+from graph_cache import load_graph
+from paths import PathArena
 
 
 
@@ -13,18 +23,25 @@ from tree import Node, Tree
 
 
 
-def load_maze(filename):
+def load_maze(filename, packed=False):
 
     """
     Loads in maze image and converts to binary array.
 
     Arguments:
     - Filename of maze image
+    - Whether to return a bit-packed maze (one bit per pixel, read from the file a tile at a time when possible)
 
     Returns:
-    - Maze as a numpy array
+    - Maze as a numpy array or PackedMaze
     """
 
+    if packed:
+        try:
+            return load_packed_maze(filename)
+        except ValueError: # not an uncompressed BMP - decode it with PIL and pack it afterwards
+            return PackedMaze.from_array(load_maze(filename))
+
     # Open the maze image and get its dimensions
     maze_image = Image.open(filename)
     w, h = maze_image.size
@@ -41,181 +58,285 @@ def load_maze(filename):
 
 
 
-def remove_loops(path):
+def trim_queue(ranked, pending, sorted_mode, mode, bw, dropped=None):
 
     """
-    Removes loops from the given path to ensure only simple paths are found.
+    Keeps the best bw entries of the queue, in the same order as sorting the whole queue by heuristic and keeping the
+    first bw. The queue is held in two parts: the entries ranked by the last trim, in a list stored back to front so
+    the next entry is popped off its end, and the entries added since then, in the order they were added. The ranked
+    part is still sorted (or sorted the other way round, which only needs the order reversed), so only the added
+    entries are inserted in place - a binary search over the list and one insert each. The first trim picks the top bw
+    with a heap.
 
     Arguments:
-    - Path found by an individual ant
+    - Ranked entries, a list of (heuristic, entry, ...) tuples with the front of the queue last
+    - Entries added since the last trim, front first (emptied here)
+    - Heuristic the ranked entries are sorted by (None if not sorted)
+    - Heuristic to sort by - 1 ranks far from the end first, -1 ranks close to the end first
+    - Beamwidth
+    - List the trimmed entries are appended to (optional)
 
     Returns:
-    - Path with any repeated nodes removed
+    - Ranked entries after the trim, front of the queue last
     """
 
-    new_path = []
-    i = 0
-    while i < len(path):
+    if(sorted_mode is None):
+        queue = ranked[::-1] + list(pending)
+        pending.clear()
+        kept = heapq.nlargest(bw, queue, key=lambda x: mode*x[0])
+        if dropped is not None:
+            kept_entries = set(item[1] for item in kept)
+            dropped.extend(item for item in queue if item[1] not in kept_entries)
+        return kept[::-1]
+
+    if(sorted_mode != mode):
+        # sorted the other way round - reverse the runs of equal heuristic but keep each run in queue order
+        runs = [list(run) for h, run in groupby(reversed(ranked), key=itemgetter(0))]
+        ranked = list(chain.from_iterable(reversed(runs)))[::-1]
+
+    for item in pending:
+
+        # ranked rises towards the front of the queue (the end of the list) - go in front of every entry ranked the
+        # same or higher, so ties keep their queue order
+        key = mode*item[0]
+        low, high = 0, len(ranked)
+        while low < high:
+            middle = (low + high)//2
+            if mode*ranked[middle][0] < key:
+                low = middle + 1
+            else:
+                high = middle
 
-        # search from just after current index
-        for t in range(12):
+        if len(ranked) - low < bw:
+            ranked.insert(low, item)
+        elif dropped is not None:
+            dropped.append(item)
+    pending.clear()
 
-            try:     
-                index = path.index(path[i], i+1) # find the next index that matches
-                del path[i+1:index+1]
+    # the worst entries are at the start of the list
+    excess = len(ranked) - bw
+    if excess > 0:
+        if dropped is not None:
+            dropped.extend(ranked[:excess])
+        del ranked[:excess]
 
-            except ValueError as ve:
-                if(i == 60):
-                    print("no loop")
-        
-        i+=1
+    return ranked
 
 
 
 
+class PathMarks():
+
+    """
+    One row of bits per queue item, bit i set if node id i is on the item's path. The rows are one block allocated up
+    front with a row for every item the queue can hold, and a row is given back when its item leaves the queue, so
+    extending a path copies a row instead of allocating a new bitset.
+    """
+
+    def __init__(self, slots, num_nodes):
+        self.row_bytes = (num_nodes + 7)//8
+        self.bits = np.zeros(slots*self.row_bytes, dtype=np.uint8)
+        self.view = memoryview(self.bits) # indexing the memoryview gives python ints, much faster than numpy scalars
+        self.free = list(range(slots - 1, -1, -1))
+
+
+
+    def start(self, node):
+
+        """
+        Takes a row for a path holding a single node.
+
+        Arguments:
+        - Node id
+
+        Returns:
+        - Row of the path
+        """
+
+        row = self.free.pop()
+        offset = row*self.row_bytes
+        self.view[offset:offset + self.row_bytes] = bytes(self.row_bytes)
+        self.view[offset + (node >> 3)] |= 1 << (node & 7)
+
+        return row
+
+
+
+    def extend(self, row, node):
+
+        """
+        Takes a row for a path extended by one node.
+
+        Arguments:
+        - Row of the path being extended
+        - Node id added
+
+        Returns:
+        - Row of the extended path
+        """
+
+        new_row = self.free.pop()
+        offset, new_offset = row*self.row_bytes, new_row*self.row_bytes
+        self.view[new_offset:new_offset + self.row_bytes] = self.view[offset:offset + self.row_bytes]
+        self.view[new_offset + (node >> 3)] |= 1 << (node & 7)
+
+        return new_row
+
+
+
+    def marked(self, row, node):
+
+        return (self.view[row*self.row_bytes + (node >> 3)] >> (node & 7)) & 1
+
+
+
+    def release(self, row):
+
+        self.free.append(row)
+
+
+
+    def nbytes(self):
+
+        return self.bits.nbytes
 
-def build_search_tree_using_tree(tree, bw, maze_array):
+
+
+
+def beam_search_entries(graph, bw, compact_at=1 << 16):
 
     """
-    Builds search tree using breadth first search subject to given beamwidth and finds paths from entrance to exit.
+    Beam search over the graph. Paths are kept in a shared arena as parent pointers, so extending a path never copies
+    it, and the arena is compacted to the paths still in the queue whenever it passes a size limit. The nodes on each
+    queued path are marked in a fixed block of bit rows (PathMarks), sized by the beamwidth.
 
     Arguments:
-    - Tree of nodes built from maze
-    - Beamwidth to limit number of nodes at each level
-    - Maze in array form
+    - Graph built from maze
+    - Beamwidth to limit number of paths kept in the queue
+    - Number of arena entries before the first compaction
 
     Returns:
-    - Paths found from start to end of maze
+    - Arena holding the paths
+    - Arena entries whose path reaches the end
+    - Marks of the queued paths (for their memory use)
     """
 
-    all_paths = []
-    tabu_list = [] # dead ends 
-    final_ant_node_location = tree.end_location # have to check location instead of node id now 
+    heuristic_info = graph.heuristic_info.tolist()
+    rows = (graph.location_ids // graph.width).tolist()
+    final_node = graph.end
+    final_row = graph.end_location[0]
 
-    # init a queue and place starting node s in queue (start of maze)
-    [r, c] = tree.start_location
-    parent_location_id = r*len(maze_array[0]) + c
-    start_vertex = tree.nodes[parent_location_id]
-    queue = [[parent_location_id]]
+    arena = PathArena()
+    start = arena.add(graph.start, -1, 1)
+    completed = []
+    # the queue never holds more than bw items plus the children of the item being extended
+    max_degree = int(np.diff(graph.offsets).max()) if graph.num_nodes > 0 else 0
+    on_path = PathMarks(bw + max_degree + 1, graph.num_nodes)
 
-    if (tree.compare(start_vertex.location, final_ant_node_location) == True):
+    if (graph.start == final_node):
         print("end found")
-        return 0
-
-    
+        return arena, [start], on_path
 
-    while (len(queue) > 0):
+    # init a queue and place starting node s in queue (start of maze)
+    # each item is the heuristic of the path's last node, its arena entry and its row of node marks
+    # the queue is kept as the entries ranked by the last trim (front last) and the entries added since (see trim_queue)
+    ranked = []
+    pending = deque([(heuristic_info[graph.start], start, on_path.start(graph.start))])
+    sorted_mode = None
+    dropped = []
+
+    while (len(ranked) > 0 or len(pending) > 0):
         # current =  dequeue from queue
-        path = queue.pop(0) # current node searching from
-
-        current_node = path[-1]
-        current_vertex =  tree.nodes[current_node]
-        routes = tree.pixel_routes[current_node]
-        visited = [parent_location_id, current_node] # nodes that have been visited
-        valid_routes_outer = [n for n in routes if (n[0]*len(maze_array[0]) + n[1]) not in visited]
-        children, lasts = tree.find_paths(current_node, valid_routes_outer, maze_array, visited) # find children dynamically
-        possible_children = [c for c, distance in current_vertex.children.items() if c not in path]
-        #possible_children = [c for c, distance in current_vertex.children.items() if c not in visited]
-
-        if (tree.compare(tree.nodes[current_node].location, final_ant_node_location) == True):
-                #print("end found")
-                all_paths.append(new_path)
+        h, entry, row = ranked.pop() if ranked else pending.popleft() # current node searching from
+        current_node = int(arena.nodes[entry])
+
+        # paths reaching the end were stored when they were added to the queue
+        if (current_node == final_node):
+            on_path.release(row)
+            continue
+
+        path_length = int(arena.lengths[entry])
+        for edge in graph.edge_ids(current_node):
+            child_id = int(graph.targets[edge])
+            if on_path.marked(row, child_id):
                 continue
 
-        # don't add this path back to queue
-        if(len(possible_children) == 0):
-
-            continue 
+            child = arena.add(child_id, entry, path_length + int(graph.lengths[edge]))
+            pending.append((heuristic_info[child_id], child, on_path.extend(row, child_id)))
 
-        for child_id in possible_children:
-            new_path = list(path)
-            new_path.append(child_id)
-            queue.append(new_path)
-        
-            if (tree.compare(tree.nodes[child_id].location, final_ant_node_location) == True):
-                #print("end found")
-                all_paths.append(new_path)
-            
+            if (child_id == final_node):
+                completed.append(child)
 
-      
-        if (len(queue) > bw):
+        on_path.release(row)
 
-            #print("trimming")
-            #best = sorted(queue, key=lambda x: tree.nodes[x[-1]].heuristic_info, reverse=True)[0:bw] 
+        if (len(ranked) + len(pending) > bw):
 
             # adaptable heuristic
-            if(current_vertex.location[0] < np.round(final_ant_node_location[0]/4)):
-                #best = sorted(queue, key=lambda x: tree.nodes[x[-1]].heuristic_info, reverse=True)[0:bw]  # this is the normal one
-                best = sorted(queue, key=lambda x: (1/tree.nodes[x[-1]].heuristic_info), reverse=True)[0:bw] # look for shortest path first?
-            elif (current_vertex.location[0] < np.round(final_ant_node_location[0]/2)):
-                #best = sorted(queue, key=lambda x: (1/tree.nodes[x[-1]].heuristic_info), reverse=True)[0:bw] 
-                best = sorted(queue, key=lambda x: tree.nodes[x[-1]].heuristic_info, reverse=True)[0:bw]  # this is the normal one
+            current_row = rows[current_node]
+            if(current_row < np.round(final_row/4)):
+                mode = -1 # look for shortest path first?
+            elif (current_row < np.round(final_row/2)):
+                mode = 1 # this is the normal one
             else:
-                best = sorted(queue, key=lambda x: (1/tree.nodes[x[-1]].heuristic_info), reverse=True)[0:bw] # shortest path
-
-            queue = best
-    
-
-    return all_paths
+                mode = -1 # shortest path
 
+            ranked = trim_queue(ranked, pending, sorted_mode, mode, bw, dropped)
+            sorted_mode = mode
+            for item in dropped:
+                on_path.release(item[2])
+            dropped.clear()
 
+        # forget the paths that were trimmed or came to a dead end
+        if (arena.size >= compact_at):
+            remap = arena.compact([item[1] for item in chain(ranked, pending)] + completed).tolist()
+            ranked = [(h, remap[e], row) for h, e, row in ranked]
+            pending = deque((h, remap[e], row) for h, e, row in pending)
+            completed = [remap[e] for e in completed]
+            compact_at = max(compact_at, 2*arena.size)
 
+    return arena, completed, on_path
 
 
 
 
-def draw_path(maze_array, best_path, filename):
+def build_search_tree_using_tree(tree, bw, maze_array):
 
     """
-    Draws longest path found in red on original maze image.
+    Builds search tree using breadth first search subject to given beamwidth and finds paths from entrance to exit.
 
     Arguments:
+    - Tree or Graph of nodes built from maze
+    - Beamwidth to limit number of nodes at each level
     - Maze in array form
-    - Longest path found, specified using pixel location ids
-    - Filename of original maze
 
+    Returns:
+    - Paths found from start to end of maze, specified in node location ids
+    - Full length of each path, specified in terms of pixel ids
     """
 
-    # convert to RGB format and the save as bmp file
-    filename_results = filename[:-4] + "_result_BS.bmp"
-    print(filename_results)
+    graph = as_graph(tree, maze_array)
+    arena, completed, on_path = beam_search_entries(graph, bw)
 
-    width = maze_array.shape[0]
-    height = maze_array.shape[1]
+    return [graph.location_ids[arena.trace(entry)].tolist() for entry in completed], [int(arena.lengths[entry]) for entry in completed]
 
-    maze_array = maze_array.astype(int).flatten()
-    maze_array[maze_array==1] = 255 
 
-    # red is 255, 0, 0
-    # mark path with 122
-    for i in range(len(best_path)):
 
-        maze_array[best_path[i]] = 125 # mark path
-
-    
-    maze_length = len(maze_array)
-    image = []
-    for j in range(maze_length):
 
-        # if path, colour in red
-        if (maze_array[j] == 125):
+def draw_path(maze_array, best_path, filename, end_colour=None, graph=None):
 
-            image.append(255)
-            image.append(0)
-            image.append(0)
+    """
+    Draws longest path found in red on original maze image.
 
-        else:
+    Arguments:
+    - Maze in array form
+    - Longest path found, specified using pixel location ids
+    - Filename of original maze
+    - RGB colour for the end of a gradient along the path (optional)
+    - Graph whose pheromone is drawn underneath as a heat map (optional)
 
-            image.append(maze_array[j])
-            image.append(maze_array[j])
-            image.append(maze_array[j])
-    
-    image = np.array(image, dtype = np.uint8)
-    image = image.reshape((width, height, 3))
-    pil = Image.fromarray(image)
-    pil.save(filename_results)
-    
+    """
 
+    render.draw_path(maze_array, best_path, filename, "_result_BS", save_png=False, end_colour=end_colour, graph=graph)
 
 
 
@@ -226,13 +347,16 @@ def build_full_path(tree, path):
     From given node location ids, build full path with inbetween pixel locations.
 
     Arguments:
-    - Tree of nodes built from maze
+    - Tree or Graph of nodes built from maze
     - Path found, specified using node location ids
 
     Returns:
     - Full path containing all pixels between start and end
     """
 
+    if isinstance(tree, Graph):
+        return tree.build_full_path(path)
+
     full_path = [[path[0]]]
     start = path[0]
     for i in range(1, len(path)):
@@ -247,36 +371,36 @@ def build_full_path(tree, path):
 
 
 
-def beam_search(tree, maze_array):
+def beam_search(tree, maze_array, bw=1500):
 
     """
     Performs beam search for the given maze to find the longest path between the start and end.
 
     Arguments:
-    - Tree of nodes built from maze
+    - Tree or Graph of nodes built from maze
     - Maze in array form
+    - Beam width - only hyperparameter - chance of not finding the end node (not complete)
 
     Returns:
     - Longest path found during beam search, specified in pixel location ids
     """
 
 
-    bw = 1500 # beam width - only hyperparameter - chance of not finding the end node (not complete)
-    paths = build_search_tree_using_tree(tree, bw, maze_array)
-
-    # remove loops from paths 
-    print("removing loops")
-    for j in range(len(paths)):
-        remove_loops(paths[j])
- 
-    print(len(paths))
-    # return longest
-    longest_path = []
-    for i in range(len(paths)):
-        full_path = build_full_path(tree, paths[i])
-        flat_full_path = [item for sublist in full_path for item in sublist]
-        if(len(flat_full_path) > len(longest_path)):
-            longest_path = flat_full_path
+    graph = as_graph(tree, maze_array)
+    arena, completed, on_path = beam_search_entries(graph, bw)
+    print(len(completed))
+    print("Path arena: {created} entries created, {size} kept ({peak_size} at peak, capacity {capacity}, {megabytes:.1f} MB), {compactions} compactions".format(**arena.stats()))
+    print("Path marks: {:.1f} MB".format(on_path.nbytes()/2**20))
+
+    # beam paths never revisit a node, so there are no loops to remove
+    # return longest - only its path is traced back and built in full
+    if(len(completed) == 0):
+        return []
+
+    longest = max(completed, key=lambda entry: arena.lengths[entry])
+    path = graph.location_ids[arena.trace(longest)].tolist()
+    full_path = build_full_path(graph, path)
+    longest_path = [item for sublist in full_path for item in sublist]
     
    
     return longest_path
@@ -292,14 +416,14 @@ def main():
     """
 
 
-    filename = 'Mazes/Small-Medium2.bmp'
-    maze_array = load_maze(filename)
-    t = Tree(maze_array)
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium2.bmp'
+    maze_array = load_maze(filename, packed=True)
+    g = load_graph(filename, maze_array) # built once per maze, then loaded from the cache
     print("Finished building tree")
 
     print("Searching for longest path...")
    
-    best_path = beam_search(t, maze_array)
+    best_path = beam_search(g, maze_array)
     print("Found best path")
     print(best_path)
     print(len(best_path))
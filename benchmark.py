@@ -0,0 +1,272 @@
+# benchmarks
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+import numpy as np
+from tree import Tree
+from graph import Graph
+import render
+from ant_system_dynamic import load_maze, ant_system
+from beam_search_dynamic import beam_search
+from packed_maze import save_packed_maze
+from maze_generator import generate_maze
+
+
+# benchmark suite - times every phase of solving a maze on its own, on the bundled mazes and on synthetic mazes of
+# growing size, and compares the results with a stored baseline
+# each maze runs in a fresh process, so the peak RSS after a phase is the peak of loading the maze and every phase up
+# to and including that one (ru_maxrss only ever grows)
+
+
+PHASES = ['load', 'create_nodes', 'tree_from_maze', 'find_paths', 'graph', 'ant_system', 'beam_search', 'draw_path']
+SOLVER_PHASES = ['ant_system', 'beam_search']
+SOLVER_MAX_PIXELS = 500000 # the solvers take many minutes on the Medium mazes - larger mazes only time the other phases
+BUNDLED_MAZES = 'Mazes/*.bmp'
+SYNTHETIC_SIZES = [101, 401, 1601]
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+
+
+
+def peak_rss_mb():
+
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+
+
+def benchmark_maze(task):
+
+    """
+    Times every phase of solving one maze. Runs in its own worker process.
+
+    Arguments:
+    - Tuple of maze filename, phases to run, number of ants, beam width, random seed, largest maze (in pixels) the
+      solvers are run on and the directory for the result images
+
+    Returns:
+    - Dictionary with the maze, its size and the wall time, peak RSS (and path length, for the solvers) of each phase
+    """
+
+    filename, phases, n_k, bw, seed, solver_max_pixels, output_dir = task
+    result = {'maze': filename, 'phases': {}}
+
+    def record(phase, start, path_length=None):
+        result['phases'][phase] = {'wall_time': round(time.perf_counter() - start, 4), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+        if path_length is not None:
+            result['phases'][phase]['path_length'] = path_length
+
+    # the solvers print progress - keep only the measurements
+    with contextlib.redirect_stdout(io.StringIO()):
+
+        # the phases the solvers need are always run, but only recorded if asked for
+        start = time.perf_counter()
+        maze_array = load_maze(filename, packed=True)
+        record('load', start)
+        result['shape'] = list(maze_array.shape)
+        if(maze_array.shape[0]*maze_array.shape[1] > solver_max_pixels):
+            phases = [phase for phase in phases if phase not in SOLVER_PHASES]
+
+        start = time.perf_counter()
+        tree = Tree(maze_array, build_paths=False)
+        record('create_nodes', start)
+
+        start = time.perf_counter()
+        tree.tree_from_maze(maze_array)
+        record('tree_from_maze', start)
+
+        if 'find_paths' in phases:
+            start = time.perf_counter()
+            for location_id in tree.nodes:
+                tree.find_paths(location_id, None, None, ())
+            record('find_paths', start)
+
+        start = time.perf_counter()
+        g = Graph.from_tree(tree, maze_array)
+        record('graph', start)
+        result['nodes'] = g.num_nodes
+        result['edges'] = g.num_edges
+        del tree
+
+        path = []
+        if 'ant_system' in phases:
+            start = time.perf_counter()
+            best_path = ant_system(g, maze_array, n_k=n_k, rng=seed)
+            path = [pixel for sublist in g.build_full_path(best_path) for pixel in sublist] if best_path else []
+            record('ant_system', start, len(path))
+
+        if 'beam_search' in phases:
+            start = time.perf_counter()
+            beam_path = beam_search(g, maze_array, bw)
+            record('beam_search', start, len(beam_path))
+            path = path or beam_path
+
+        if 'draw_path' in phases:
+            start = time.perf_counter()
+            render.draw_path(maze_array, path, os.path.join(output_dir, os.path.basename(filename)), '_result_bench')
+            record('draw_path', start)
+
+    for phase in list(result['phases']):
+        if phase not in phases:
+            del result['phases'][phase]
+
+    return result
+
+
+
+def run_suite(filenames, synthetic_sizes=SYNTHETIC_SIZES, loops=0.0, phases=PHASES, n_k=10, bw=1500, seed=0, solver_max_pixels=SOLVER_MAX_PIXELS, workers=1):
+
+    """
+    Benchmarks the given mazes and synthetic mazes of the given sizes.
+
+    Arguments:
+    - Filenames of maze images
+    - Sizes of the synthetic mazes
+    - Loop density of the synthetic mazes (see maze_generator.py)
+    - Phases to time
+    - Number of ants
+    - Beam width
+    - Random seed, for the synthetic mazes and the ant system
+    - Largest maze (in pixels) the solvers are run on
+    - Number of mazes benchmarked at once (1 gives the most reliable times)
+
+    Returns:
+    - Dictionary with the environment and the results of every maze
+    """
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        filenames = list(filenames)
+        for size in synthetic_sizes:
+            filename = os.path.join(directory, "synthetic_{}.bmp".format(size))
+            save_packed_maze(generate_maze(size, size, loops, seed), filename)
+            filenames.append(filename)
+
+        tasks = [(f, phases, n_k, bw, seed, solver_max_pixels, directory) for f in filenames]
+        with Pool(workers, maxtasksperchild=1) as pool:
+            results = []
+            for result in pool.imap(benchmark_maze, tasks):
+                # synthetic mazes are named by size rather than by their temporary file
+                if result['maze'].startswith(directory):
+                    result['maze'] = os.path.basename(result['maze'])
+                print_result(result)
+                results.append(result)
+
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count(), 'n_k': n_k, 'bw': bw, 'seed': seed, 'loops': loops, 'solver_max_pixels': solver_max_pixels}
+
+    return {'environment': environment, 'results': results}
+
+
+
+def print_result(result):
+
+    """
+    Prints one line per phase of a benchmarked maze.
+
+    Arguments:
+    - Result returned by benchmark_maze
+    """
+
+    print("{} ({} x {}, {} nodes, {} edges)".format(result['maze'], result['shape'][0], result['shape'][1], result.get('nodes'), result.get('edges')))
+    for phase, m in result['phases'].items():
+        length = ", path length {}".format(m['path_length']) if 'path_length' in m else ""
+        print("  {:<15}{:>9.3f}s {:>9.1f} MB{}".format(phase, m['wall_time'], m['peak_rss_mb'], length))
+
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.05, min_mb=10.0):
+
+    """
+    Compares benchmark results with a baseline. A phase has regressed if it got more than tolerance slower (and by more
+    than min_seconds, so the noise of very short phases is ignored), if its peak RSS grew by more than tolerance (and
+    by more than min_mb), or if a solver found a path of a different length with the same seed.
+
+    Arguments:
+    - Results returned by run_suite
+    - Baseline, in the same form
+    - Allowed relative increase
+    - Smallest increase in seconds that counts
+    - Smallest increase in MB that counts
+
+    Returns:
+    - Descriptions of the regressions
+    """
+
+    old = {(r['maze'], phase): m for r in baseline['results'] for phase, m in r['phases'].items()}
+    regressions = []
+
+    for r in results['results']:
+        for phase, m in r['phases'].items():
+            if (r['maze'], phase) not in old:
+                continue
+            b = old[(r['maze'], phase)]
+
+            if(m['wall_time'] > b['wall_time']*(1 + tolerance) and m['wall_time'] - b['wall_time'] > min_seconds):
+                regressions.append("{} {}: {:.3f}s -> {:.3f}s".format(r['maze'], phase, b['wall_time'], m['wall_time']))
+            if(m['peak_rss_mb'] > b['peak_rss_mb']*(1 + tolerance) and m['peak_rss_mb'] - b['peak_rss_mb'] > min_mb):
+                regressions.append("{} {}: peak RSS {:.1f} MB -> {:.1f} MB".format(r['maze'], phase, b['peak_rss_mb'], m['peak_rss_mb']))
+            if(m.get('path_length') != b.get('path_length')):
+                regressions.append("{} {}: path length {} -> {}".format(r['maze'], phase, b.get('path_length'), m.get('path_length')))
+
+    return regressions
+
+
+
+def main():
+
+    """
+    Command line entry point, e.g. python3 benchmark.py --baseline benchmark_baseline.json
+
+    """
+
+    parser = argparse.ArgumentParser(description="Time tree construction, both solvers and rendering on the bundled and synthetic mazes.")
+    parser.add_argument('mazes', nargs='*', help="maze images (default: every bundled maze)")
+    parser.add_argument('--synthetic', type=int, nargs='*', default=SYNTHETIC_SIZES, help="sizes of the synthetic mazes (none to skip them)")
+    parser.add_argument('--loops', type=float, default=0.0, help="loop density of the synthetic mazes (0 for perfect mazes)")
+    parser.add_argument('--phases', nargs='+', choices=PHASES, default=PHASES, help="phases to time")
+    parser.add_argument('--n-k', type=int, default=10, help="number of ants")
+    parser.add_argument('--bw', type=int, default=1500, help="beam width")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--solver-max-pixels', type=int, default=SOLVER_MAX_PIXELS, help="largest maze (in pixels) the solvers are timed on")
+    parser.add_argument('--workers', type=int, default=1, help="mazes benchmarked at once")
+    parser.add_argument('--output', default='benchmark_results.json', help="where the results are written")
+    parser.add_argument('--baseline', default=None, help="results to compare against (default: {} if it exists)".format(DEFAULT_BASELINE))
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative increase before a phase counts as a regression")
+    args = parser.parse_args()
+
+    filenames = args.mazes or sorted(glob.glob(BUNDLED_MAZES))
+    results = run_suite(filenames, args.synthetic, args.loops, args.phases, args.n_k, args.bw, args.seed, args.solver_max_pixels, args.workers)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print("Results written to {}".format(args.output))
+
+    baseline = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) else None)
+    if args.update_baseline:
+        with open(args.baseline or DEFAULT_BASELINE, 'w') as f:
+            json.dump(results, f, indent=2)
+        print("Baseline updated")
+    elif baseline is not None:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against {}:".format(baseline))
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("No regressions against {}".format(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+# exact longest simple path - reference optima for judging ant system and beam search
+
+import contextlib
+import io
+import sys
+import time
+import numpy as np
+from tree import Tree
+from graph import Graph, as_graph
+from reduction import reduce_graph
+import ant_system_dynamic
+import beam_search_dynamic
+
+
+
+# overall: bitmask dynamic programming when the graph is small enough, otherwise depth first branch and bound
+# the longest simple path problem is NP-hard, so on larger mazes the search runs out of time and returns the best path
+# found together with an upper bound on the optimum
+
+
+
+
+def bitmask_dp(graph):
+
+    """
+    Finds the longest simple path from start to end by dynamic programming over subsets of nodes.
+    best[mask, v] is the length of the longest path from the start that visits exactly the nodes in mask and ends at v.
+    Subsets are processed in order of size, one edge at a time for all subsets of that size at once.
+
+    Arguments:
+    - Graph built from maze
+
+    Returns:
+    - Longest path, specified in node ids (empty if the end cannot be reached)
+    - Full length of the path (pixels)
+    """
+
+    n = graph.num_nodes
+    sources = np.repeat(np.arange(n), np.diff(graph.offsets))
+    targets = graph.targets
+    lengths = graph.lengths
+
+    masks = np.arange(1 << n, dtype=np.int64)
+    size = np.zeros(1 << n, dtype=np.int64)
+    for v in range(n):
+        size += (masks >> v) & 1
+
+    best = np.full((1 << n, n), -1, dtype=np.int32)
+    best[1 << graph.start, graph.start] = 1
+
+    for k in range(1, n):
+
+        # every subset of this size containing the start
+        layer = masks[(size == k) & (((masks >> graph.start) & 1) == 1)]
+        for u, v, w in zip(sources.tolist(), targets.tolist(), lengths.tolist()):
+            if u == graph.end:
+                continue
+            current = best[layer, u]
+            valid = (current >= 0) & (((layer >> v) & 1) == 0)
+            extended = layer[valid] | (1 << v)
+            best[extended, v] = np.maximum(best[extended, v], current[valid] + w)
+
+    mask = int(np.argmax(best[:, graph.end]))
+    path_length = int(best[mask, graph.end])
+    if(path_length < 0):
+        return [], 0
+
+    # walk back through the table, finding an edge that explains every step
+    path = [graph.end]
+    node = graph.end
+    while node != graph.start:
+        previous = mask ^ (1 << node)
+        for e in np.flatnonzero(targets == node).tolist():
+            u = int(sources[e])
+            if (previous >> u) & 1 and best[previous, u] >= 0 and best[previous, u] + lengths[e] == best[mask, node]:
+                break
+        path.append(u)
+        mask, node = previous, u
+
+    return path[::-1], path_length
+
+
+
+
+def reachable_bound(adjacency, neighbours, max_in, visited, node, end):
+
+    """
+    Upper bound on how much longer a path at the given node can get. Only nodes still reachable without revisiting the
+    path can be added, minus the dead ends among them (nodes with fewer than two of those neighbours left, peeled
+    off repeatedly), and each of them is entered at most once, through at most its longest incoming edge.
+
+    Arguments:
+    - Outgoing (target, length) pairs of every node
+    - Neighbours of every node, in either direction
+    - Length of the longest edge into every node
+    - Whether every node is on the current path
+    - Last node of the current path
+    - End node
+
+    Returns:
+    - Upper bound on the pixels still to be added, or -1 if the end can no longer be reached
+    """
+
+    seen = {node}
+    stack = [node]
+    while stack:
+        u = stack.pop()
+        for v, w in adjacency[u]:
+            if not visited[v] and v not in seen:
+                seen.add(v)
+                stack.append(v)
+
+    if end not in seen:
+        return -1
+
+    # peel off dead ends - a simple path can only pass through a node with two neighbours left
+    degree = {u: sum(1 for v in neighbours[u] if v in seen) for u in seen}
+    stack = [u for u, d in degree.items() if d < 2 and u != node and u != end]
+    removed = set(stack)
+    while stack:
+        u = stack.pop()
+        for v in neighbours[u]:
+            if v in seen and v not in removed:
+                degree[v] -= 1
+                if degree[v] < 2 and v != node and v != end:
+                    removed.add(v)
+                    stack.append(v)
+
+    return sum(max_in[v] for v in seen if v not in removed and v != node)
+
+
+
+
+def branch_and_bound(graph, time_budget=60.0, initial_path=None):
+
+    """
+    Finds the longest simple path from start to end with an iterative depth first search, pruning every branch whose
+    upper bound cannot beat the best path found so far.
+
+    Arguments:
+    - Graph built from maze
+    - Time budget in seconds
+    - Known path to start from, specified in node ids, so only longer paths are searched for (optional)
+
+    Returns:
+    - Longest path found, specified in node ids (empty if the end cannot be reached)
+    - Full length of the path (pixels)
+    - Upper bound on the longest path (equal to the length if the search finished, so the path is optimal)
+    """
+
+    start_time = time.perf_counter()
+    n = graph.num_nodes
+    end = graph.end
+
+    # try the longest corridors first so good paths are found early
+    adjacency = []
+    for u in range(n):
+        edges = graph.edge_ids(u)
+        adjacency.append(sorted(zip(graph.targets[edges].tolist(), graph.lengths[edges].tolist()), key=lambda x: -x[1]))
+    neighbours = [set() for u in range(n)]
+    for u in range(n):
+        for v, w in adjacency[u]:
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+    max_in = np.zeros(n, dtype=np.int64)
+    np.maximum.at(max_in, graph.targets, graph.lengths)
+    max_in = max_in.tolist()
+
+    visited = bytearray(n)
+    visited[graph.start] = 1
+    extra = reachable_bound(adjacency, neighbours, max_in, visited, graph.start, end)
+    if(extra < 0):
+        return [], 0, 0
+
+    best_path = []
+    best_length = 0
+    if initial_path is not None and len(initial_path) > 1:
+        edges = graph.find_edges(np.asarray(initial_path[:-1], dtype=np.int64), initial_path[1:])
+        if(np.all(edges >= 0) and initial_path[0] == graph.start and initial_path[-1] == end and len(set(initial_path)) == len(initial_path)):
+            best_path = list(initial_path)
+            best_length = 1 + int(graph.lengths[edges].sum())
+
+    # each frame is the node, the index of its next child, the path length so far and its upper bound
+    stack = [[graph.start, 0, 1, 1 + extra]]
+    steps = 0
+
+    while stack:
+
+        steps += 1
+        if(steps % 1024 == 0 and time.perf_counter() - start_time > time_budget):
+            # every path not yet searched continues from a frame on the stack
+            return best_path, best_length, max(best_length, max(frame[3] for frame in stack))
+
+        frame = stack[-1]
+        node, child, path_length, bound = frame
+        if(bound <= best_length or child == len(adjacency[node])):
+            visited[node] = 0
+            stack.pop()
+            continue
+
+        frame[1] += 1
+        v, w = adjacency[node][child]
+        if visited[v]:
+            continue
+
+        if(v == end):
+            if(path_length + w > best_length):
+                best_length = path_length + w
+                best_path = [f[0] for f in stack] + [end]
+            continue
+
+        visited[v] = 1
+        extra = reachable_bound(adjacency, neighbours, max_in, visited, v, end)
+        if(extra < 0 or path_length + w + extra <= best_length):
+            visited[v] = 0
+            continue
+
+        stack.append([v, 0, path_length + w, path_length + w + extra])
+
+    return best_path, best_length, best_length
+
+
+
+
+def exact_longest_path(tree, maze_array, time_budget=60.0, dp_max_nodes=18, initial_path=None, reduce=False):
+
+    """
+    Finds the longest simple path between the start and end, exactly if the time budget allows.
+
+    Arguments:
+    - Tree or Graph of nodes built from maze
+    - Maze in array form
+    - Time budget in seconds for the branch and bound search
+    - Largest number of nodes solved by bitmask dynamic programming (memory grows as 2^nodes)
+    - Known path, e.g. from one of the heuristics, specified in node location ids (optional)
+    - Whether to search the reduced graph (see reduction.py) - the optimum is the same but the path is given in the
+      nodes of the reduced graph, which is returned too
+
+    Returns:
+    - Longest path found, specified in node location ids
+    - Full length of the path (pixels)
+    - Upper bound on the longest path (equal to the length if the path is optimal)
+    - Graph that was searched
+    """
+
+    graph = as_graph(tree, maze_array)
+    if reduce:
+        graph, stats = reduce_graph(graph, maze_array)
+
+    if(graph.num_nodes <= dp_max_nodes):
+        path, path_length = bitmask_dp(graph)
+        upper_bound = path_length
+    else:
+        if initial_path is not None:
+            # nodes merged away by the reduction are dropped, the rest of the path follows the merged edges
+            kept = set(graph.location_ids.tolist())
+            initial_path = [graph.node_id(location) for location in initial_path if location in kept]
+        path, path_length, upper_bound = branch_and_bound(graph, time_budget, initial_path)
+
+    return graph.location_ids[path].tolist(), path_length, upper_bound, graph
+
+
+
+
+def quality_gap(reference_length, path_length):
+
+    """
+    Fraction by which a path falls short of the reference (optimal) length.
+
+    Arguments:
+    - Reference path length
+    - Length of the path being judged
+
+    Returns:
+    - Gap between 0 (optimal) and 1
+    """
+
+    if(reference_length <= 0):
+        return 0.0
+
+    return (reference_length - path_length)/reference_length
+
+
+
+
+def main():
+
+    """
+    Solves the given mazes exactly (within the time budget) and reports how far ant system and beam search fall short.
+    python3 exact_solver.py [time budget in seconds] [mazes...]
+
+    """
+
+    time_budget = float(sys.argv[1]) if len(sys.argv) > 1 else 60.0
+    filenames = sys.argv[2:] if len(sys.argv) > 2 else ['Mazes/Small1.bmp', 'Mazes/Small2.bmp', 'Mazes/Small-Medium1.bmp', 'Mazes/Small-Medium2.bmp']
+
+    for filename in filenames:
+
+        maze_array = ant_system_dynamic.load_maze(filename)
+
+        # the solvers print progress - keep only the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            g = Graph.from_tree(Tree(maze_array), maze_array)
+            as_path = ant_system_dynamic.ant_system(g, maze_array)
+            as_length = 1 + sum(len(p) for p in g.build_full_path(as_path)[1:]) if len(as_path) > 0 else 0
+            bs_length = len(beam_search_dynamic.beam_search(g, maze_array))
+
+        # the search starts from the ant system path, so it only looks for longer ones
+        start = time.perf_counter()
+        path, path_length, upper_bound, reduced = exact_longest_path(g, maze_array, time_budget, initial_path=as_path, reduce=True)
+        elapsed = time.perf_counter() - start
+
+        if(path_length == upper_bound):
+            print("{}: optimal {} ({:.2f}s, {} of {} nodes left after reduction)".format(filename, path_length, elapsed, reduced.num_nodes, g.num_nodes))
+            for name, length in [('ant system', as_length), ('beam search', bs_length)]:
+                print("  {}: {} (gap {:.1%})".format(name, length, quality_gap(path_length, length)))
+        else:
+            print("{}: best found {}, upper bound {} (out of time after {:.2f}s, {} of {} nodes left after reduction)".format(filename, path_length, upper_bound, elapsed, reduced.num_nodes, g.num_nodes))
+            for name, length in [('ant system', as_length), ('beam search', bs_length)]:
+                print("  {}: {} (gap {:.1%} to best found, at most {:.1%} to optimal)".format(name, length, quality_gap(path_length, length), quality_gap(upper_bound, length)))
+
+
+if __name__ == "__main__":
+    main()
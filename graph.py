@@ -0,0 +1,344 @@
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+from tree import Tree
+
+
+# array-backed graph class
+# node ids are dense (0..N-1) and follow the Tree node ids: entrance first, junctions in row-major order, exit last
+# edges are stored in CSR form: the edges leaving node u are offsets[u]..offsets[u+1]-1
+
+
+# arrays describing the graph structure - these never change during a search so they can be shared between processes
+STRUCTURE_ARRAYS = ['location_ids', 'heuristic_info', 'offsets', 'targets', 'lengths', 'path_offsets', 'path_pixels', 'edge_table']
+
+
+class Graph():
+
+
+    def __init__(self, location_ids, heuristic_info, offsets, targets, lengths, path_offsets, path_pixels, width):
+        self.location_ids = location_ids # node id -> pixel location id (sorted, since ids follow row-major order)
+        self.heuristic_info = heuristic_info # node id -> heuristic info
+        self.offsets = offsets # node id -> first edge leaving the node
+        self.targets = targets # edge id -> destination node id
+        self.lengths = lengths # edge id -> number of pixels on the edge (same as Node.children distances)
+        self.pheromone = np.ones(len(targets)) # edge id -> pheromone, init with small amount of pheromone
+        self.path_offsets = path_offsets # edge id -> first pixel of the edge in path_pixels
+        self.path_pixels = path_pixels # all edge pixel paths packed into one buffer
+        self.width = width
+        self.num_nodes = len(location_ids)
+        self.num_edges = len(targets)
+        self.start = 0
+        self.end = self.num_nodes - 1
+        self.start_location = self.location(self.start)
+        self.end_location = self.location(self.end)
+        self.edge_table = None # padded edges per node, built on first use
+
+
+
+    @classmethod
+    def from_tree(cls, tree, maze_array):
+
+        """
+        Builds the array-backed graph from the edges found by the tree.
+
+        Arguments:
+        - Tree of nodes built from maze
+        - Maze in array form
+
+        Returns:
+        - Graph with the same nodes and edges as the tree
+        """
+
+        width = len(maze_array[0])
+
+        # nodes are ordered by tree node id
+        vertices = sorted(tree.nodes.values(), key=lambda n: n.id)
+        location_ids = np.array([n.location_id for n in vertices], dtype=np.int64)
+        heuristic_info = np.array([n.heuristic_info for n in vertices], dtype=np.float64)
+
+        # tree edges are already sorted by source node
+        offsets = np.zeros(len(vertices) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(tree.edge_sources, minlength=len(vertices)))
+
+        return cls(location_ids, heuristic_info, offsets, tree.edge_targets, tree.edge_lengths, tree.path_offsets, tree.path_pixels, width)
+
+
+
+    def to_shared_memory(self):
+
+        """
+        Copies the graph structure into one shared memory block so that worker processes can attach to it without pickling.
+        The caller owns the block and must close and unlink it when done.
+
+        Returns:
+        - Shared memory block and a small picklable description of the arrays inside it
+        """
+
+        self.padded_edges() # share the edge table too so workers don't rebuild it
+
+        layout = []
+        size = 0
+        for name in STRUCTURE_ARRAYS:
+            a = getattr(self, name)
+            size = (size + 7) & ~7 # keep every array 8 byte aligned
+            layout.append((name, a.dtype.str, a.shape, size))
+            size += a.nbytes
+
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape, offset) in layout:
+            np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = getattr(self, name)
+
+        return block, {'name': block.name, 'layout': layout, 'width': self.width}
+
+
+
+    @classmethod
+    def from_shared_memory(cls, spec):
+
+        """
+        Attaches to a graph structure created by to_shared_memory. The arrays are read-only views into the shared block.
+
+        Arguments:
+        - Description returned by to_shared_memory
+
+        Returns:
+        - Graph using the shared arrays, with its own pheromone array
+        """
+
+        block = shared_memory.SharedMemory(name=spec['name'])
+        arrays = {}
+        for (name, dtype, shape, offset) in spec['layout']:
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+            arrays[name].flags.writeable = False
+
+        graph = cls(arrays['location_ids'], arrays['heuristic_info'], arrays['offsets'], arrays['targets'], arrays['lengths'], arrays['path_offsets'], arrays['path_pixels'], spec['width'])
+        graph.edge_table = arrays['edge_table']
+        graph.shared_block = block # keep the block open as long as the graph is alive
+
+        return graph
+
+
+
+    def location(self, node):
+
+        """
+        Returns the [row, column] location of the given node.
+        """
+
+        location_id = int(self.location_ids[node])
+
+        return [location_id // self.width, location_id % self.width]
+
+
+
+    def node_id(self, location_id):
+
+        """
+        Returns the dense node id of the node at the given pixel location id.
+        """
+
+        return int(np.searchsorted(self.location_ids, location_id))
+
+
+
+    def edge_ids(self, node):
+
+        """
+        Returns the ids of the edges leaving the given node.
+        """
+
+        return range(self.offsets[node], self.offsets[node+1])
+
+
+
+    def children(self, node):
+
+        """
+        Returns the node ids of the children of the given node.
+        """
+
+        return self.targets[self.offsets[node]:self.offsets[node+1]]
+
+
+
+    def padded_edges(self):
+
+        """
+        Returns the edges leaving every node as a (nodes x max out-degree) array, padded with -1.
+        """
+
+        if self.edge_table is None:
+            degrees = np.diff(self.offsets)
+            self.edge_table = np.full((self.num_nodes, max(int(degrees.max()), 1)), -1, dtype=np.int64)
+            rows = np.repeat(np.arange(self.num_nodes), degrees)
+            cols = np.arange(self.num_edges) - np.repeat(self.offsets[:-1], degrees)
+            self.edge_table[rows, cols] = np.arange(self.num_edges)
+
+        return self.edge_table
+
+
+
+    def find_edge(self, src, dest):
+
+        """
+        Returns the id of the edge from src to dest, or -1 if the nodes are not linked.
+        """
+
+        start = self.offsets[src]
+        matches = np.flatnonzero(self.targets[start:self.offsets[src+1]] == dest)
+        if(len(matches) == 0):
+            return -1
+
+        return int(start + matches[0])
+
+
+
+    def find_edges(self, sources, dests):
+
+        """
+        Returns the ids of the edges linking each pair of nodes at once, or -1 where the nodes are not linked.
+        """
+
+        candidates = self.padded_edges()[sources]
+        matches = (candidates >= 0) & (self.targets[candidates] == np.asarray(dests)[:, None])
+        edges = candidates[np.arange(len(candidates)), np.argmax(matches, axis=1)]
+
+        return np.where(matches.any(axis=1), edges, -1)
+
+
+
+    def edge_path(self, edge):
+
+        """
+        Returns the pixel location ids along the given edge, excluding the source node and including the destination.
+        """
+
+        return self.path_pixels[self.path_offsets[edge]:self.path_offsets[edge+1]]
+
+
+
+    def build_full_path(self, path):
+
+        """
+        From given node location ids, build full path with inbetween pixel locations.
+
+        Arguments:
+        - Path found, specified using node location ids
+
+        Returns:
+        - Full path containing all pixels between start and end (empty if the path is)
+
+        Raises:
+        - ValueError if two consecutive nodes of the path are not linked by an edge
+        """
+
+        if(len(path) == 0):
+            return []
+
+        full_path = [[path[0]]]
+        start = self.node_id(path[0])
+        for i in range(1, len(path)):
+            end = self.node_id(path[i])
+            edge = self.find_edge(start, end)
+            if(edge < 0):
+                raise ValueError("No edge from node {} to node {} (location ids {} and {}) - the path is broken".format(start, end, path[i-1], path[i]))
+            full_path.append(self.edge_path(edge).tolist())
+            start = end
+
+        return full_path
+
+
+
+    def nbytes(self):
+
+        """
+        Returns the number of bytes held by the graph arrays.
+        """
+
+        arrays = [self.location_ids, self.heuristic_info, self.offsets, self.targets, self.lengths, self.pheromone, self.path_offsets, self.path_pixels]
+
+        return sum(a.nbytes for a in arrays)
+
+
+
+
+def as_graph(tree, maze_array):
+
+    """
+    Returns the given tree as an array-backed graph, converting it if it is a dict-based Tree.
+
+    Arguments:
+    - Tree or Graph built from maze
+    - Maze in array form
+
+    Returns:
+    - Graph
+    """
+
+    if isinstance(tree, Graph):
+        return tree
+
+    return Graph.from_tree(tree, maze_array)
+
+
+
+
+def tree_memory_usage(tree):
+
+    """
+    Estimates the memory held by the nodes of a dict-based tree, including their dicts, paths and locations.
+
+    Arguments:
+    - Tree of nodes built from maze
+
+    Returns:
+    - Size in bytes
+    """
+
+    size = sys.getsizeof(tree.nodes)
+    seen = set() # ints are shared between dicts, count each object once
+    for location_id, vertex in tree.nodes.items():
+        objects = [location_id, vertex, vertex.__dict__, vertex.location, vertex.heuristic_info, vertex.children, vertex.paths, vertex.pheromone]
+        objects += vertex.location
+        for child, path in vertex.paths.items():
+            objects += [child, vertex.children[child], vertex.pheromone[child], path]
+            if isinstance(path, list):
+                objects += path
+        for o in objects:
+            if id(o) not in seen:
+                seen.add(id(o))
+                size += sys.getsizeof(o)
+
+    # paths stored as views share the tree's packed buffer
+    if hasattr(tree, 'path_pixels'):
+        size += tree.path_pixels.nbytes
+
+    return size
+
+
+
+
+def main():
+
+    """
+    Compares the memory used by the dict-based tree and the array-backed graph for a given maze.
+
+    """
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium1.bmp'
+    maze_array = np.array(Image.open(filename).point(lambda p: p > 128 and 1))
+    t = Tree(maze_array)
+    g = Graph.from_tree(t, maze_array)
+
+    tree_bytes = tree_memory_usage(t)
+    graph_bytes = g.nbytes()
+    print("Nodes: {}, edges: {}, pixels on edges: {}".format(g.num_nodes, g.num_edges, len(g.path_pixels)))
+    print("Tree: {:.2f} MB".format(tree_bytes/1e6))
+    print("Graph: {:.2f} MB".format(graph_bytes/1e6))
+    print("Ratio: {:.1f}x".format(tree_bytes/graph_bytes))
+
+
+if __name__ == "__main__":
+    main()
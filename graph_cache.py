@@ -0,0 +1,304 @@
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import zipfile
+import numpy as np
+from tree import Tree
+from graph import Graph, STRUCTURE_ARRAYS
+from reduction import reduce_graph
+
+
+# on-disk cache of the graphs built from mazes
+# building the tree is the slow part of every run and gives the same graph every time for the same maze, so the graph
+# arrays are saved to an uncompressed .npz file named after a hash of the maze file's contents - editing the maze
+# changes the hash, so stale entries are never used, and CACHE_VERSION is stored in every entry so that entries
+# written by an older graph format are rebuilt
+# on later runs the arrays are memory-mapped straight out of the .npz, and the least recently used entries are removed
+# once the cache directory grows past its size limit
+
+
+CACHE_VERSION = 2 # 2: pixel location ids are 64-bit on mazes of 2**31 pixels or more
+CACHE_DIR = os.environ.get('MAZE_GRAPH_CACHE', '.graph_cache')
+MAX_CACHE_BYTES = 1 << 30
+
+
+
+
+def maze_hash(filename):
+
+    """
+    Hash of the contents of a maze file, read in chunks so large mazes are never held in memory.
+
+    Arguments:
+    - Filename of maze image
+
+    Returns:
+    - Hex digest
+    """
+
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+
+def cache_path(filename, reduce=False, cache_dir=None):
+
+    """
+    Where the graph of a maze is cached.
+
+    Arguments:
+    - Filename of maze image
+    - Whether the entry is for the reduced graph
+    - Cache directory (CACHE_DIR by default)
+
+    Returns:
+    - Path of the .npz entry
+    """
+
+    variant = 'reduced' if reduce else 'graph'
+
+    return os.path.join(cache_dir or CACHE_DIR, "{}_{}.npz".format(maze_hash(filename)[:32], variant))
+
+
+
+def save_graph(graph, path):
+
+    """
+    Writes the graph structure to an uncompressed .npz file. The file is written under a temporary name and then
+    renamed, so other processes never see half of an entry.
+
+    Arguments:
+    - Graph built from maze
+    - Path of the .npz entry
+    """
+
+    graph.padded_edges() # store the edge table too so later runs don't rebuild it
+
+    arrays = {name: getattr(graph, name) for name in STRUCTURE_ARRAYS}
+    arrays['width'] = np.array(graph.width, dtype=np.int64)
+    arrays['version'] = np.array(CACHE_VERSION, dtype=np.int64)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.chmod(temporary, 0o644) # mkstemp creates the file readable by its owner only
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+
+def memmap_npz(path):
+
+    """
+    Memory-maps every array of an uncompressed .npz file. np.load ignores mmap_mode for .npz files, so the data offset
+    of each member is read from the zip headers instead.
+
+    Arguments:
+    - Path of the .npz file
+
+    Returns:
+    - Dictionary of read-only memory-mapped arrays, by name
+    """
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("{} is compressed and cannot be memory-mapped".format(path))
+
+            # local file header: 30 bytes, then the name and extra field, whose lengths are at bytes 26 and 28
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length = int.from_bytes(local_header[26:28], 'little')
+            extra_length = int.from_bytes(local_header[28:30], 'little')
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            name = info.filename[:-4] # drop .npy
+            if(np.prod(shape) == 0 or dtype.hasobject):
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape, order='F' if fortran_order else 'C')
+
+    return arrays
+
+
+
+def load_cached_graph(path):
+
+    """
+    Loads a cached graph, with its structure memory-mapped from the cache entry.
+
+    Arguments:
+    - Path of the .npz entry
+
+    Returns:
+    - Graph, or None if the entry is missing, unreadable or from another CACHE_VERSION
+    """
+
+    try:
+        arrays = memmap_npz(path)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    if('version' not in arrays or int(arrays['version']) != CACHE_VERSION or any(name not in arrays for name in STRUCTURE_ARRAYS)):
+        return None
+
+    graph = Graph(arrays['location_ids'], arrays['heuristic_info'], arrays['offsets'], arrays['targets'], arrays['lengths'], arrays['path_offsets'], arrays['path_pixels'], int(arrays['width']))
+    graph.edge_table = arrays['edge_table']
+
+    return graph
+
+
+
+def evict(cache_dir=None, max_bytes=MAX_CACHE_BYTES, keep=None):
+
+    """
+    Removes the least recently used entries until the cache directory is no larger than max_bytes. Entries are marked
+    as used by setting their modification time whenever they are loaded.
+
+    Arguments:
+    - Cache directory (CACHE_DIR by default)
+    - Size limit in bytes
+    - Path of an entry that must not be removed, e.g. the one just written (optional)
+
+    Returns:
+    - Paths of the removed entries
+    """
+
+    cache_dir = cache_dir or CACHE_DIR
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz'):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError: # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for mtime, size, path in entries)
+    removed = []
+    for mtime, size, path in sorted(entries):
+        if(total <= max_bytes):
+            break
+        if keep is not None and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed.append(path)
+
+    return removed
+
+
+
+def invalidate(filename=None, cache_dir=None):
+
+    """
+    Removes the cached graphs of a maze, or every cached graph.
+
+    Arguments:
+    - Filename of maze image (None for the whole cache)
+    - Cache directory (CACHE_DIR by default)
+
+    Returns:
+    - Paths of the removed entries
+    """
+
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+
+    prefix = maze_hash(filename)[:32] if filename is not None else ''
+    removed = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz') and name.startswith(prefix):
+            os.unlink(os.path.join(cache_dir, name))
+            removed.append(os.path.join(cache_dir, name))
+
+    return removed
+
+
+
+def load_graph(filename, maze_array, reduce=False, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+
+    """
+    Returns the graph of a maze, from the cache if it has been built before, otherwise building and caching it.
+
+    Arguments:
+    - Filename of maze image (its contents are the cache key)
+    - Maze in array form or PackedMaze (only used when the graph has to be built)
+    - Whether to return the reduced graph (see reduction.py)
+    - Cache directory (CACHE_DIR by default)
+    - Size limit of the cache directory in bytes
+
+    Returns:
+    - Graph built from maze
+    """
+
+    path = cache_path(filename, reduce, cache_dir)
+    graph = load_cached_graph(path)
+    if graph is not None:
+        os.utime(path) # most recently used
+        print("Loaded graph from cache ({})".format(path))
+        return graph
+
+    graph = Graph.from_tree(Tree(maze_array), maze_array)
+    if reduce:
+        graph, stats = reduce_graph(graph, maze_array)
+
+    save_graph(graph, path)
+    evict(cache_dir, max_bytes, keep=path)
+
+    return graph
+
+
+
+def main():
+
+    """
+    Compares building the graph of a given maze with loading it from the cache.
+    python3 graph_cache.py maze.bmp, or python3 graph_cache.py --clear to empty the cache
+
+    """
+
+    if len(sys.argv) > 1 and sys.argv[1] == '--clear':
+        print("Removed {} entries".format(len(invalidate())))
+        return
+
+    from ant_system_dynamic import load_maze
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium1.bmp'
+    maze_array = load_maze(filename, packed=True)
+    invalidate(filename)
+
+    start = time.perf_counter()
+    built = load_graph(filename, maze_array)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = load_graph(filename, maze_array)
+    load_time = time.perf_counter() - start
+
+    same = all(np.array_equal(getattr(built, name), getattr(cached, name)) for name in STRUCTURE_ARRAYS)
+    print("Built in {:.3f}s, loaded from cache in {:.3f}s ({:.1f} MB on disk), same graph: {}".format(build_time, load_time, os.path.getsize(cache_path(filename)) / 2**20, same))
+
+
+if __name__ == "__main__":
+    main()
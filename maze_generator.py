@@ -0,0 +1,204 @@
+import argparse
+import time
+import numpy as np
+from packed_maze import PackedMaze, save_packed_maze
+
+
+# synthetic maze generator
+# randomised Kruskal: every wall between two neighbouring cells gets a random weight and the walls of the minimum
+# spanning tree are knocked down, which is the maze Kruskal's algorithm gives when it visits the walls in random order
+# the spanning tree is found with Boruvka's algorithm instead of a union-find loop - every component picks its lightest
+# wall to a different component in each round, all at once with numpy, so there are only about log2(cells) rounds
+# loops are added afterwards by knocking down a fraction of the walls left standing
+# cells sit on odd rows and columns with walls in between, the entrance is in the first row and the exit in the last
+# row - the layout load_maze and create_root_node expect
+
+
+
+
+def merge_components(parent):
+
+    """
+    Merges every component with the one its lightest edge leads to (one round of Boruvka's algorithm).
+
+    Arguments:
+    - Component each component's lightest edge leads to (itself if it is a root) - where two components picked the
+      same edge, only one of them may point at the other
+
+    Returns:
+    - New component id of every component
+    - Number of components left
+    """
+
+    own = np.arange(len(parent), dtype=parent.dtype)
+
+    # pointer jumping until every component points at its root
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            break
+        parent = grandparent
+
+    roots = parent == own
+    new_id = (np.cumsum(roots, dtype=parent.dtype) - 1)[parent]
+
+    return new_id, int(np.count_nonzero(roots))
+
+
+
+def spanning_tree(rows, cols, rng):
+
+    """
+    Finds the minimum spanning tree of the grid of cells with random edge weights (Boruvka's algorithm).
+
+    Arguments:
+    - Number of rows of cells
+    - Number of columns of cells
+    - Random number generator
+
+    Returns:
+    - Whether each edge is in the tree, horizontal edges first (rows x cols-1, then rows-1 x cols, flattened)
+    """
+
+    horizontal = rows*(cols - 1)
+    total = horizontal + (rows - 1)*cols
+    everything = np.iinfo(np.int64).max
+
+    # random weights with the edge id in the low bits, so no two weights are equal and each key names its edge
+    # (the bits of a positive float32 sort in the same order as the floats)
+    keys = np.arange(total, dtype=np.int64)
+    keys |= rng.random(total, dtype=np.float32).view(np.int32).astype(np.int64) << 32
+    in_tree = np.zeros(total, dtype=bool)
+    right_keys = keys[:horizontal].reshape(rows, cols - 1) # edge to the right of each cell
+    down_keys = keys[horizontal:].reshape(rows - 1, cols) # edge below each cell
+
+    # the first round works on the grid itself - the lightest of the four edges around every cell, from shifted slices
+    lightest = np.full((rows, cols), everything, dtype=np.int64)
+    np.minimum(lightest[:, :-1], right_keys, out=lightest[:, :-1])
+    np.minimum(lightest[:, 1:], right_keys, out=lightest[:, 1:])
+    np.minimum(lightest[:-1, :], down_keys, out=lightest[:-1, :])
+    np.minimum(lightest[1:, :], down_keys, out=lightest[1:, :])
+
+    parent = np.arange(rows*cols, dtype=np.int32).reshape(rows, cols)
+    right = right_keys == lightest[:, :-1]
+    left = right_keys == lightest[:, 1:]
+    down = down_keys == lightest[:-1, :]
+    up = down_keys == lightest[1:, :]
+    del lightest
+    # every cell points across its lightest edge - where both ends picked the same edge the left or upper cell stays
+    # put as the root
+    parent[:, :-1] += right & ~left
+    parent[:, 1:] -= left
+    parent[:-1, :] += (down & ~up)*np.int32(cols)
+    parent[1:, :] -= up*np.int32(cols)
+    in_tree[:horizontal] = (right | left).ravel()
+    in_tree[horizontal:] = (down | up).ravel()
+    del right, left, down, up
+
+    labels, components = merge_components(parent.ravel())
+    labels = labels.reshape(rows, cols)
+
+    # edges between the components left, with their ends relabelled
+    u = np.concatenate([labels[:, :-1].ravel(), labels[:-1, :].ravel()])
+    v = np.concatenate([labels[:, 1:].ravel(), labels[1:, :].ravel()])
+    del labels
+    keep = np.flatnonzero(u != v)
+    u, v, keys = u.take(keep), v.take(keep), keys.take(keep)
+    del keep
+
+    while components > 1 and len(u) > 0:
+
+        # lightest edge leaving every component
+        lightest = np.full(components, everything, dtype=np.int64)
+        np.minimum.at(lightest, u, keys)
+        np.minimum.at(lightest, v, keys)
+        from_u = keys == lightest[u]
+        from_v = keys == lightest[v]
+        in_tree[keys[from_u | from_v] & 0xffffffff] = True
+
+        parent = np.arange(components, dtype=np.int32)
+        parent[u[from_u]] = v[from_u]
+        parent[v[from_v]] = u[from_v]
+
+        # two components that picked the same edge point at each other - the smaller one becomes the root
+        own = np.arange(components, dtype=np.int32)
+        mutual = (parent[parent] == own) & (own < parent)
+        parent[mutual] = own[mutual]
+        new_id, components = merge_components(parent)
+
+        # relabel the edges and drop the ones now inside a component
+        u = new_id[u]
+        v = new_id[v]
+        keep = np.flatnonzero(u != v)
+        u, v, keys = u.take(keep), v.take(keep), keys.take(keep)
+
+    return in_tree
+
+
+
+def generate_maze(height, width, loops=0.0, seed=None):
+
+    """
+    Generates a random maze.
+
+    Arguments:
+    - Height in pixels (rounded up to an odd number, at least 3)
+    - Width in pixels (rounded up to an odd number, at least 3)
+    - Loop density - fraction of the walls left after building the perfect maze that are knocked down as well (0 gives
+      a perfect maze, with exactly one path between any two cells)
+    - Random seed or Generator
+
+    Returns:
+    - PackedMaze
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = max(height//2, 1)
+    cols = max(width//2, 1)
+    height = 2*rows + 1
+    width = 2*cols + 1
+
+    is_open = spanning_tree(rows, cols, rng)
+    if(loops > 0):
+        walls = np.flatnonzero(~is_open)
+        is_open[rng.choice(walls, size=int(round(loops*len(walls))), replace=False)] = True
+
+    maze = np.zeros((height, width), dtype=bool)
+    maze[1::2, 1::2] = True
+    horizontal = rows*(cols - 1)
+    maze[1::2, 2:-1:2] = is_open[:horizontal].reshape(rows, cols - 1) # walls between left and right neighbours
+    maze[2:-1:2, 1::2] = is_open[horizontal:].reshape(rows - 1, cols) # walls between upper and lower neighbours
+    del is_open
+
+    # entrance above a random cell of the top row, exit below a random cell of the bottom row
+    maze[0, 2*rng.integers(cols) + 1] = True
+    maze[-1, 2*rng.integers(cols) + 1] = True
+
+    return PackedMaze.from_array(maze)
+
+
+
+def main():
+
+    """
+    Command line entry point, e.g. python3 maze_generator.py 10001 10001 Mazes/Large1.bmp --loops 0.05 --seed 1
+
+    """
+
+    parser = argparse.ArgumentParser(description="Generate a random maze (randomised Kruskal) and save it as a 1-bit BMP.")
+    parser.add_argument('height', type=int, help="height in pixels (made odd)")
+    parser.add_argument('width', type=int, help="width in pixels (made odd)")
+    parser.add_argument('filename', help="where the maze is saved")
+    parser.add_argument('--loops', type=float, default=0.0, help="fraction of the remaining walls knocked down to add loops (0 for a perfect maze)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    maze = generate_maze(args.height, args.width, args.loops, args.seed)
+    generated = time.perf_counter() - start
+    save_packed_maze(maze, args.filename)
+    print("{} x {} maze generated in {:.2f}s, saved in {:.2f}s to {}".format(maze.shape[0], maze.shape[1], generated, time.perf_counter() - start - generated, args.filename))
+
+
+if __name__ == "__main__":
+    main()
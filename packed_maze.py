@@ -0,0 +1,372 @@
+import struct
+import sys
+import numpy as np
+
+
+# bit-packed mazes, loaded straight from the BMP file
+# the pixel data of an uncompressed BMP is memory-mapped a band of rows (a tile) at a time and thresholded into one bit
+# per pixel, so a maze never has to be decoded into a full image - for the 1-bit mazes the packed maze is about the
+# size of the file itself
+# bit layout follows np.packbits: row r is bits[r], pixel c is bit 7 - c%8 of byte c//8, 1 = open (white)
+
+
+class PackedMaze():
+
+
+    def __init__(self, bits, width):
+        self.bits = bits # rows x ceil(width/8) uint8
+        self.shape = (len(bits), width)
+
+
+
+    @classmethod
+    def from_array(cls, maze_array):
+
+        """
+        Packs a maze that is already in array form.
+
+        Arguments:
+        - Maze in array form
+
+        Returns:
+        - PackedMaze
+        """
+
+        maze_array = np.asarray(maze_array, dtype=bool)
+
+        return cls(np.packbits(maze_array, axis=1), maze_array.shape[1])
+
+
+
+    def __len__(self):
+
+        return self.shape[0]
+
+
+
+    def __getitem__(self, index):
+
+        """
+        Pixel (maze[r, c]) or whole unpacked row (maze[r]), so code written for the array form can read the maze.
+
+        """
+
+        if isinstance(index, tuple):
+            r, c = index
+            if(c < 0):
+                c += self.shape[1]
+            return bool((self.bits[r, c >> 3] >> (7 - (c & 7))) & 1)
+
+        return self.rows(index, index + 1 if index != -1 else None)[0]
+
+
+
+    def rows(self, start, stop):
+
+        """
+        Unpacks a band of rows.
+
+        Arguments:
+        - First row
+        - Row after the last row (None for the rest of the maze)
+
+        Returns:
+        - Boolean array of the rows (rows x width)
+        """
+
+        return np.unpackbits(self.bits[start:stop], axis=1, count=self.shape[1]).view(bool)
+
+
+
+    def __array__(self, dtype=None, copy=None):
+
+        # the whole maze unpacked, e.g. for drawing the result
+        maze = self.rows(0, None)
+
+        return maze if dtype is None else maze.astype(dtype, copy=False)
+
+
+
+    def nbytes(self):
+
+        return self.bits.nbytes
+
+
+
+    def is_open(self, rows, cols):
+
+        """
+        Looks up many pixels at once. Pixels outside the maze count as walls.
+
+        Arguments:
+        - Rows of the pixels
+        - Columns of the pixels
+
+        Returns:
+        - Whether each pixel is open
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        r = np.where(inside, rows, 0)
+        c = np.where(inside, cols, 0)
+
+        return inside & (((self.bits[r, c >> 3] >> (7 - (c & 7))) & 1) == 1)
+
+
+
+    def open_neighbours(self, rows, cols):
+
+        """
+        Looks up the 4-neighbours of many pixels at once.
+
+        Arguments:
+        - Rows of the pixels
+        - Columns of the pixels
+
+        Returns:
+        - Whether each neighbour is open, in route order up, right, down, left (4 x pixels)
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+
+        return np.stack([self.is_open(rows - 1, cols), self.is_open(rows, cols + 1), self.is_open(rows + 1, cols), self.is_open(rows, cols - 1)])
+
+
+
+    def neighbour_bits(self, start, stop):
+
+        """
+        Open neighbours of a band of rows, as packed bits - eight pixels are handled by every byte operation.
+        Neighbours outside the maze are walls.
+
+        Arguments:
+        - First row
+        - Row after the last row
+
+        Returns:
+        - Packed bits of the band and of its up, right, down and left neighbours (each rows x ceil(width/8))
+        """
+
+        band = self.bits[start:stop]
+        wall = np.zeros((1, self.bits.shape[1]), dtype=np.uint8)
+        up = self.bits[start - 1:stop - 1] if start > 0 else np.concatenate([wall, self.bits[:stop - 1]])
+        down = self.bits[start + 1:stop + 1] if stop < self.shape[0] else np.concatenate([self.bits[start + 1:stop], wall])
+
+        # pixel c + 1 is the next lower bit, crossing into the top bit of the next byte (padding bits are walls)
+        right = band << 1
+        right[:, :-1] |= band[:, 1:] >> 7
+        left = band >> 1
+        left[:, 1:] |= band[:, :-1] << 7
+
+        return band, up, right, down, left
+
+
+
+    def junction_bits(self, start, stop):
+
+        """
+        Junctions (open pixels with more than two open neighbours) in a band of rows, as packed bits.
+
+        Arguments:
+        - First row
+        - Row after the last row
+
+        Returns:
+        - Packed junction bits (rows x ceil(width/8))
+        """
+
+        band, a, b, c, d = self.neighbour_bits(start, stop)
+
+        return band & ((a & b & (c | d)) | (c & d & (a | b)))
+
+
+
+
+def read_bmp_header(filename):
+
+    """
+    Reads the parts of a BMP header needed to find and decode the pixel data.
+
+    Arguments:
+    - Filename of maze image
+
+    Returns:
+    - Dictionary with the pixel data offset, width, height, whether rows are stored bottom-up, bits per pixel, bytes
+      per stored row and the palette (colours x 3, RGB) if there is one
+    """
+
+    with open(filename, 'rb') as f:
+        header = f.read(54)
+        if(len(header) < 54 or header[:2] != b'BM'):
+            raise ValueError("{} is not a BMP file".format(filename))
+
+        data_offset, = struct.unpack('<I', header[10:14])
+        header_size, width, height, planes, bpp, compression, _, _, _, colours_used = struct.unpack('<IiiHHIIiiI', header[14:50])
+
+        # BI_BITFIELDS (3) is only a channel mask description for 16/32 bit images - 32 bit ones use the usual order
+        if compression != 0 and not (compression == 3 and bpp == 32):
+            raise ValueError("{} is compressed (compression {}), only uncompressed BMPs can be memory-mapped".format(filename, compression))
+        if bpp not in (1, 4, 8, 24, 32):
+            raise ValueError("{} has {} bits per pixel, which is not supported".format(filename, bpp))
+
+        palette = None
+        if(bpp <= 8):
+            f.seek(14 + header_size)
+            colours = colours_used if colours_used > 0 else 1 << bpp
+            palette = np.frombuffer(f.read(4*colours), dtype=np.uint8).reshape(-1, 4)[:, 2::-1] # stored as BGRx
+
+    return {'offset': data_offset, 'width': width, 'height': abs(height), 'bottom_up': height > 0, 'bpp': bpp,
+            'stride': ((width*bpp + 31)//32)*4, 'palette': palette}
+
+
+
+def brightness(rgb):
+
+    """
+    Grey level of RGB colours, with the weights PIL uses for converting to greyscale.
+
+    Arguments:
+    - Colours (... x 3)
+
+    Returns:
+    - Grey levels (...)
+    """
+
+    rgb = np.asarray(rgb, dtype=np.int64)
+
+    return (rgb[..., 0]*299 + rgb[..., 1]*587 + rgb[..., 2]*114)//1000
+
+
+
+def threshold_tile(tile, header):
+
+    """
+    Converts stored BMP rows to packed open bits. A pixel is open if it is brighter than 128, as in load_maze.
+
+    Arguments:
+    - Stored rows (rows x stride bytes)
+    - Header returned by read_bmp_header
+
+    Returns:
+    - Packed rows (rows x ceil(width/8))
+    """
+
+    width = header['width']
+    bpp = header['bpp']
+
+    if(bpp == 1):
+        # the pixels are already packed in the same bit order - only the palette has to be applied, for all eight
+        # pixels of a byte at once
+        is_open = np.zeros(2, dtype=np.uint8)
+        is_open[:len(header['palette'])] = brightness(header['palette'][:2]) > 128
+        values = np.arange(256)
+        lut = np.zeros(256, dtype=np.uint8)
+        for bit in range(8):
+            lut |= (is_open[(values >> bit) & 1] << bit).astype(np.uint8)
+        packed = lut[tile[:, :(width + 7)//8]]
+        if(width % 8):
+            packed[:, -1] &= (0xff << (8 - width % 8)) & 0xff # padding bits at the end of the row
+        return packed
+
+    if(bpp == 4):
+        indices = np.stack([tile >> 4, tile & 15], axis=2).reshape(len(tile), -1)[:, :width]
+    elif(bpp == 8):
+        indices = tile[:, :width]
+
+    if(bpp <= 8):
+        is_open = np.zeros(256, dtype=bool)
+        is_open[:len(header['palette'])] = brightness(header['palette']) > 128
+        return np.packbits(is_open[indices], axis=1)
+
+    channels = bpp//8
+    pixels = tile[:, :width*channels].reshape(len(tile), width, channels)
+
+    return np.packbits(brightness(pixels[:, :, 2::-1]) > 128, axis=1) # BGR(A) -> RGB
+
+
+
+def load_packed_maze(filename, tile_rows=1024):
+
+    """
+    Loads in an uncompressed BMP maze as a bit-packed maze, one tile of rows at a time. Each tile is memory-mapped on
+    its own, so only the packed maze and one tile are ever held in memory.
+
+    Arguments:
+    - Filename of maze image
+    - Number of rows per tile
+
+    Returns:
+    - PackedMaze
+    """
+
+    header = read_bmp_header(filename)
+    h, w, stride = header['height'], header['width'], header['stride']
+    bits = np.zeros((h, (w + 7)//8), dtype=np.uint8)
+
+    for start in range(0, h, tile_rows):
+        stop = min(start + tile_rows, h)
+
+        # bottom-up files store the last row first
+        first_stored = h - stop if header['bottom_up'] else start
+        tile = np.memmap(filename, dtype=np.uint8, mode='r', offset=header['offset'] + first_stored*stride, shape=(stop - start, stride))
+        if header['bottom_up']:
+            tile = tile[::-1]
+
+        bits[start:stop] = threshold_tile(tile, header)
+        del tile # unmap before the next tile
+
+    return PackedMaze(bits, w)
+
+
+
+def save_packed_maze(maze, filename, tile_rows=1024):
+
+    """
+    Saves a bit-packed maze as a 1-bit BMP with a black and white palette, the same format as the bundled mazes. The
+    packed rows are already in BMP bit order, so they are written out as they are, a tile of rows at a time.
+
+    Arguments:
+    - PackedMaze
+    - Filename of maze image
+    - Number of rows per tile
+    """
+
+    h, w = maze.shape
+    stride = ((w + 31)//32)*4
+    data_offset = 14 + 40 + 8
+
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('<2sIHHI', b'BM', data_offset + stride*h, 0, 0, data_offset))
+        f.write(struct.pack('<IiiHHIIiiII', 40, w, h, 1, 1, 0, stride*h, 2835, 2835, 2, 0))
+        f.write(bytes([0, 0, 0, 0, 255, 255, 255, 0])) # palette: 0 black (wall), 1 white (open)
+
+        # rows are stored bottom-up
+        for stop in range(h, 0, -tile_rows):
+            start = max(stop - tile_rows, 0)
+            tile = np.zeros((stop - start, stride), dtype=np.uint8)
+            tile[:, :maze.bits.shape[1]] = maze.bits[start:stop]
+            f.write(tile[::-1].tobytes())
+
+
+
+def main():
+
+    """
+    Checks the packed maze against load_maze for the given mazes.
+
+    """
+
+    from PIL import Image
+
+    filenames = sys.argv[1:] if len(sys.argv) > 1 else ['Mazes/Small1.bmp', 'Mazes/Small-Medium1.bmp', 'Mazes/Medium1.bmp']
+    for filename in filenames:
+        maze = load_packed_maze(filename)
+        maze_array = np.array(Image.open(filename).point(lambda p: p > 128 and 1), dtype=bool)
+        print("{}: {} x {}, {} bytes packed, matches load_maze: {}".format(filename, maze.shape[0], maze.shape[1], maze.nbytes(), np.array_equal(maze.rows(0, None), maze_array)))
+
+
+if __name__ == "__main__":
+    main()
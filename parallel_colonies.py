@@ -0,0 +1,207 @@
+# island model ant system - several independent colonies searching the same maze in parallel
+
+import os
+import sys
+import time
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from tree import Tree
+from graph import Graph, as_graph
+from ant_system_dynamic import run_colony, load_maze
+from ant_config import AntSystemConfig, StopCondition
+
+
+
+
+# state attached once in every worker process, so the graph is never pickled per task
+worker_graph = None
+worker_pheromone = None
+worker_blocks = []
+
+
+
+
+def attach_worker(graph_spec, pheromone_spec):
+
+    """
+    Pool initializer - attaches the shared graph structure and the shared pheromone rows of all colonies.
+
+    Arguments:
+    - Description of the shared graph returned by Graph.to_shared_memory
+    - Name and shape of the shared pheromone block
+    """
+
+    global worker_graph, worker_pheromone
+
+    # pool workers share the parent's resource tracker, so attaching here does not take ownership of the blocks
+    worker_graph = Graph.from_shared_memory(graph_spec)
+    block = shared_memory.SharedMemory(name=pheromone_spec['name'])
+    worker_blocks.append(block)
+    worker_pheromone = np.ndarray(pheromone_spec['shape'], dtype=np.float64, buffer=block.buf)
+
+
+
+
+def run_epoch(task):
+
+    """
+    Runs one colony for a number of iterations inside a worker process. The colony's pheromone row is updated in place.
+
+    Arguments:
+    - Tuple of colony index, iterations, AntSystemConfig, best path, best path length and random generator state
+
+    Returns:
+    - Best path (node ids), its full length and the new random generator state
+    """
+
+    colony, iterations, config, best_path, best_path_length, rng_state = task
+
+    graph = worker_graph
+    graph.pheromone = worker_pheromone[colony] # each colony has its own row of the shared pheromone block
+    rng = np.random.Generator(np.random.PCG64())
+    rng.bit_generator.state = rng_state
+
+    best_path, best_path_length = run_colony(graph, iterations, config, best_path, best_path_length, rng)
+
+    return best_path, best_path_length, rng.bit_generator.state
+
+
+
+
+def exchange_colonies(graph, pheromone, results, exchange, Q):
+
+    """
+    Merges the colonies after an epoch, either by averaging their pheromone or by sharing the best path found by any colony.
+
+    Arguments:
+    - Graph built from maze
+    - Pheromone of every colony (colonies x edges), updated in place
+    - Results of the epoch for every colony
+    - Exchange strategy, 'average' or 'best'
+    - Positive constant for use in pheromone update
+
+    Returns:
+    - Overall best path (node ids) and its full length
+    """
+
+    best_path, best_path_length, _ = max(results, key=lambda result: result[1])
+
+    if(exchange == 'average'):
+        pheromone[:] = pheromone.mean(axis=0)
+
+    elif(exchange == 'best'):
+        # every colony deposits pheromone along the overall best path as if one of its own ants had found it
+        if(len(best_path) > 1):
+            edges = graph.find_edges(np.asarray(best_path[:-1], dtype=np.int64), best_path[1:])
+            pheromone[:, edges] += Q*len(best_path)
+
+    else:
+        raise ValueError("Unknown exchange strategy: {}".format(exchange))
+
+    return best_path, best_path_length
+
+
+
+
+def parallel_ant_system(tree, maze_array, n_colonies=None, n_k=None, t_max=None, exchange_every=2, exchange='best', seed=None, config=None):
+
+    """
+    Runs several ant system colonies in a process pool and returns the longest path found by any of them.
+    The colonies exchange information every exchange_every iterations, and the stopping rules of the configuration are
+    checked after every exchange.
+
+    Arguments:
+    - Tree or Graph of nodes built from maze
+    - Maze in array form
+    - Number of colonies (defaults to the number of cores)
+    - Number of ants per colony (overrides config.n_k if given)
+    - Number of iterations (overrides config.t_max if given)
+    - Number of iterations between exchanges
+    - Exchange strategy, 'average' (average the pheromone) or 'best' (share the best path)
+    - Seed for the colonies' random generators
+    - AntSystemConfig with the hyperparameters and stopping rules (defaults to AntSystemConfig(), as in ant_system)
+
+    Returns:
+    - Longest path found by any colony, specified in node location ids
+    """
+
+    config = config or AntSystemConfig()
+    if n_k is not None:
+        config = config.copy(n_k=n_k)
+    if t_max is not None:
+        config = config.copy(t_max=t_max)
+    if not config.has_stopping_rule():
+        raise ValueError("The run needs a stopping rule - set t_max, time_budget, stagnation or target_length")
+
+    if(n_colonies is None):
+        n_colonies = os.cpu_count()
+
+    graph = as_graph(tree, maze_array)
+    graph_block, graph_spec = graph.to_shared_memory()
+    pheromone_block = shared_memory.SharedMemory(create=True, size=max(n_colonies*graph.num_edges*8, 1))
+
+    try:
+        pheromone = np.ndarray((n_colonies, graph.num_edges), dtype=np.float64, buffer=pheromone_block.buf)
+        pheromone[:] = config.initial_pheromone # every run starts from fresh trails, whatever is left on the graph
+        pheromone_spec = {'name': pheromone_block.name, 'shape': pheromone.shape}
+
+        # independent random streams for every colony
+        rng_states = [np.random.Generator(np.random.PCG64(s)).bit_generator.state for s in np.random.SeedSequence(seed).spawn(n_colonies)]
+        colony_best = [([], 0) for i in range(n_colonies)]
+        best_path = []
+        best_path_length = 0
+
+        with Pool(n_colonies, initializer=attach_worker, initargs=(graph_spec, pheromone_spec)) as pool:
+
+            stop = StopCondition(config)
+            iterations = stop.remaining_iterations(exchange_every)
+            while(iterations > 0):
+
+                tasks = [(i, iterations, config, colony_best[i][0], colony_best[i][1], rng_states[i]) for i in range(n_colonies)]
+                results = pool.map(run_epoch, tasks)
+                rng_states = [result[2] for result in results]
+
+                best_path, best_path_length = exchange_colonies(graph, pheromone, results, exchange, config.Q)
+                colony_best = [(best_path, best_path_length) for i in range(n_colonies)]
+
+                if stop.update(best_path_length, iterations):
+                    break
+                iterations = stop.remaining_iterations(exchange_every)
+
+        # keep the merged pheromone on the caller's graph
+        graph.pheromone[:] = pheromone.mean(axis=0)
+        del pheromone
+
+    finally:
+        pheromone_block.close()
+        pheromone_block.unlink()
+        graph_block.close()
+        graph_block.unlink()
+
+    return graph.location_ids[best_path].tolist()
+
+
+
+
+def main():
+
+    """
+    Compares the wall time of one colony with several colonies running in parallel on a given maze.
+
+    """
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium1.bmp'
+    n_colonies = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    maze_array = load_maze(filename)
+    g = Graph.from_tree(Tree(maze_array), maze_array)
+
+    for n in sorted({1, n_colonies}):
+        start = time.perf_counter()
+        best_path = parallel_ant_system(g, maze_array, n_colonies=n, seed=0)
+        elapsed = time.perf_counter() - start
+        path_length = 1 + sum(len(p) for p in g.build_full_path(best_path)[1:])
+        print("Colonies: {}, wall time: {:.2f}s, path length: {}".format(n, elapsed, path_length))
+
+
+if __name__ == "__main__":
+    main()
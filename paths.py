@@ -0,0 +1,162 @@
+# path helpers shared by both solvers
+
+import numpy as np
+
+
+
+
+class PathArena():
+
+    """
+    Shared store for many paths that branch off each other. Every entry is one node plus a pointer to the entry before
+    it, so a path is a single integer and extending it never copies the nodes already on it.
+    The arrays grow by doubling and can be compacted to the entries still in use.
+    """
+
+    def __init__(self, capacity=1024):
+
+        """
+        Creates an empty arena.
+
+        Arguments:
+        - Number of entries to allocate room for at first
+        """
+
+        self.nodes = np.empty(capacity, dtype=np.int32)
+        self.parents = np.empty(capacity, dtype=np.int64)
+        self.lengths = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+        # statistics
+        self.created = 0
+        self.peak_size = 0
+        self.compactions = 0
+
+
+
+    def add(self, node, parent, length):
+
+        """
+        Adds an entry extending the path ending at parent by one node.
+
+        Arguments:
+        - Node id
+        - Entry of the path being extended (-1 to start a new path)
+        - Cumulative length of the path up to and including this node
+
+        Returns:
+        - Entry of the new path
+        """
+
+        if(self.size == len(self.nodes)):
+            self.grow()
+
+        entry = self.size
+        self.nodes[entry] = node
+        self.parents[entry] = parent
+        self.lengths[entry] = length
+        self.size += 1
+        self.created += 1
+        self.peak_size = max(self.peak_size, self.size)
+
+        return entry
+
+
+
+    def grow(self):
+
+        """
+        Doubles the room in the arena.
+
+        """
+
+        capacity = 2*len(self.nodes)
+        for name in ['nodes', 'parents', 'lengths']:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+
+
+    def trace(self, entry):
+
+        """
+        Rebuilds a path by following the parent pointers back to its first node.
+
+        Arguments:
+        - Entry at the end of the path
+
+        Returns:
+        - Path from its first node to the entry, specified in node ids
+        """
+
+        path = []
+        while entry >= 0:
+            path.append(int(self.nodes[entry]))
+            entry = int(self.parents[entry])
+
+        return path[::-1]
+
+
+
+    def compact(self, live):
+
+        """
+        Drops every entry that is not on one of the given paths. Parents are always added before their children, so the
+        kept entries stay in the same order.
+
+        Arguments:
+        - Entries whose paths are still needed
+
+        Returns:
+        - New entry of every old entry (-1 for the entries dropped)
+        """
+
+        keep = np.zeros(self.size, dtype=bool)
+        entries = np.unique(np.asarray(live, dtype=np.int64))
+
+        # mark whole paths, one step back along every path at a time
+        while len(entries) > 0:
+            keep[entries] = True
+            entries = np.unique(self.parents[entries])
+            entries = entries[entries >= 0]
+            entries = entries[~keep[entries]]
+
+        remap = np.full(self.size + 1, -1, dtype=np.int64) # last slot maps the -1 parent to -1
+        kept = np.flatnonzero(keep)
+        remap[kept] = np.arange(len(kept))
+
+        self.nodes[:len(kept)] = self.nodes[kept]
+        self.lengths[:len(kept)] = self.lengths[kept]
+        self.parents[:len(kept)] = remap[self.parents[kept]]
+        self.size = len(kept)
+        self.compactions += 1
+
+        return remap[:-1]
+
+
+
+    def nbytes(self):
+
+        """
+        Memory allocated by the arena.
+
+        Returns:
+        - Number of bytes
+        """
+
+        return self.nodes.nbytes + self.parents.nbytes + self.lengths.nbytes
+
+
+
+    def stats(self):
+
+        """
+        Size statistics of the arena.
+
+        Returns:
+        - Dictionary with the entries created, held now and at the peak, the capacity, memory and number of compactions
+        """
+
+        return {'created': self.created, 'size': self.size, 'peak_size': self.peak_size, 'capacity': len(self.nodes), 'megabytes': self.nbytes()/2**20, 'compactions': self.compactions}
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+# random numbers drawn in large blocks
+# every step of the ants needs one number per moving ant - drawing them a block at a time and handing out slices of
+# the block avoids a generator call per step, and the numbers come out in the same order as single draws would
+
+
+class RandomBlocks():
+
+
+    def __init__(self, rng=np.random, block_size=16384):
+        self.rng = rng # numpy.random module or Generator
+        self.block_size = block_size
+        self.block = np.zeros(0)
+        self.position = 0
+
+
+
+    def uniform(self, low=0.0, high=1.0, size=1):
+
+        """
+        Returns the next numbers of the block, sampled uniformly between low and high. Same signature as
+        Generator.uniform, so the blocks can be used in place of the generator.
+
+        Arguments:
+        - Lower bound
+        - Upper bound
+        - Number of samples
+
+        Returns:
+        - Array of samples (a view into the block)
+        """
+
+        if(self.position + size > len(self.block)):
+            # keep the unused numbers at the front so the order of the stream does not change
+            self.block = np.concatenate([self.block[self.position:], self.rng.random(max(self.block_size, size))])
+            self.position = 0
+
+        samples = self.block[self.position:self.position + size]
+        self.position += size
+
+        if(low == 0.0 and high == 1.0):
+            return samples
+
+        return low + (high - low)*samples
@@ -0,0 +1,324 @@
+import sys
+from collections import deque
+import numpy as np
+from PIL import Image
+from tree import Tree, location_id_dtype
+from graph import Graph, as_graph
+
+
+# graph reduction - removes the parts of the maze that can never be on a simple path from the entrance to the exit
+# 1. dead ends are peeled off, one layer at a time
+# 2. the remaining graph is split into biconnected components (blocks) with an iterative Tarjan search - a simple
+#    path can only use the blocks on the way from the entrance's block to the exit's block, every other block hangs
+#    off a single cut node and could only be entered and left through it
+# 3. chains of nodes with only two neighbours left are merged into single edges, with their pixel paths joined up
+# the reduced graph is an ordinary Graph, so both solvers and draw_path work on it unchanged
+
+
+
+
+def undirected_neighbours(graph):
+
+    """
+    Neighbours of every node, ignoring the direction of the edges.
+
+    Arguments:
+    - Graph built from maze
+
+    Returns:
+    - List of neighbour sets, one per node
+    """
+
+    neighbours = [set() for u in range(graph.num_nodes)]
+    sources = np.repeat(np.arange(graph.num_nodes), np.diff(graph.offsets)).tolist()
+    for u, v in zip(sources, graph.targets.tolist()):
+        if u != v:
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+
+    return neighbours
+
+
+
+
+def prune_dead_ends(graph, neighbours):
+
+    """
+    Repeatedly removes nodes with fewer than two neighbours left (other than the start and end), so whole dead end
+    branches are removed from their tips inwards.
+
+    Arguments:
+    - Graph built from maze
+    - Undirected neighbours of every node
+
+    Returns:
+    - Whether every node is kept
+    """
+
+    keep = np.ones(graph.num_nodes, dtype=bool)
+    degree = [len(n) for n in neighbours]
+    stack = [u for u in range(graph.num_nodes) if degree[u] < 2 and u != graph.start and u != graph.end]
+    keep[stack] = False
+
+    while stack:
+        u = stack.pop()
+        for v in neighbours[u]:
+            if keep[v]:
+                degree[v] -= 1
+                if degree[v] < 2 and v != graph.start and v != graph.end:
+                    keep[v] = False
+                    stack.append(v)
+
+    return keep
+
+
+
+
+def biconnected_components(neighbours, keep, root):
+
+    """
+    Finds the bridges and biconnected components reachable from the root with Tarjan's algorithm, using an explicit
+    stack instead of recursion so that long corridors of junctions cannot overflow the call stack.
+
+    Arguments:
+    - Undirected neighbours of every node
+    - Whether every node is kept
+    - Node to start the search from
+
+    Returns:
+    - Biconnected components, each a list of node ids
+    - Bridges, as (u, v) pairs of node ids
+    """
+
+    discovery = {root: 0}
+    low = {root: 0}
+    components = []
+    bridges = []
+    edge_stack = []
+
+    # each frame is the node, its parent in the search tree and an iterator over its neighbours
+    stack = [(root, -1, iter(neighbours[root]))]
+
+    while stack:
+        u, parent, children = stack[-1]
+
+        advanced = False
+        for v in children:
+            if not keep[v] or v == parent:
+                continue
+            if v not in discovery:
+                discovery[v] = low[v] = len(discovery)
+                edge_stack.append((u, v))
+                stack.append((v, u, iter(neighbours[v])))
+                advanced = True
+                break
+            if discovery[v] < discovery[u]:
+                # back edge to an ancestor
+                low[u] = min(low[u], discovery[v])
+                edge_stack.append((u, v))
+
+        if advanced:
+            continue
+
+        # u is finished - pass its low value up and close the component if u's parent separates it from the rest
+        stack.pop()
+        if parent >= 0:
+            low[parent] = min(low[parent], low[u])
+            if low[u] >= discovery[parent]:
+                component = set()
+                while True:
+                    a, b = edge_stack.pop()
+                    component.add(a)
+                    component.add(b)
+                    if (a, b) == (parent, u):
+                        break
+                components.append(sorted(component))
+            if low[u] > discovery[parent]:
+                bridges.append((parent, u))
+
+    return components, bridges
+
+
+
+
+def blocks_between(components, start, end):
+
+    """
+    Finds the biconnected components on the way from the start to the end. The components and the cut nodes joining
+    them form a tree, so there is only one such chain.
+
+    Arguments:
+    - Biconnected components, each a list of node ids
+    - Start node
+    - End node
+
+    Returns:
+    - Indices of the components on the chain (empty if the end cannot be reached)
+    """
+
+    containing = {}
+    for i, component in enumerate(components):
+        for u in component:
+            containing.setdefault(u, []).append(i)
+
+    # breadth first search over components, which are linked when they share a cut node
+    previous = {i: -1 for i in containing.get(start, [])}
+    queue = deque(previous)
+    while queue:
+        i = queue.popleft()
+        if end in components[i]:
+            chain = []
+            while i >= 0:
+                chain.append(i)
+                i = previous[i]
+            return chain[::-1]
+        for u in components[i]:
+            for j in containing[u]:
+                if j not in previous:
+                    previous[j] = i
+                    queue.append(j)
+
+    return []
+
+
+
+
+def contract_chains(graph, keep, neighbours, shape):
+
+    """
+    Builds the reduced graph from the kept nodes, merging every chain of nodes with exactly two kept neighbours into a
+    single edge. Between two nodes only the longest merged edge is kept.
+
+    Arguments:
+    - Graph built from maze
+    - Whether every node is kept
+    - Undirected neighbours of every node
+    - Height and width of maze (for the type of the pixel location ids)
+
+    Returns:
+    - Reduced Graph, with the same start and end
+    """
+
+    kept_neighbours = {u: [v for v in neighbours[u] if keep[v]] for u in np.flatnonzero(keep).tolist()}
+    branch = [u for u, n in kept_neighbours.items() if len(n) != 2 or u == graph.start or u == graph.end]
+    is_branch = set(branch)
+
+    # follow every edge out of a branch node until the next branch node
+    merged = {}
+    for u in branch:
+        for first in graph.edge_ids(u):
+            first = int(first)
+            if not keep[graph.targets[first]]:
+                continue
+            chain = [first]
+            previous, current = u, int(graph.targets[first])
+            while current not in is_branch:
+                following = [v for v in kept_neighbours[current] if v != previous][0]
+                e = graph.find_edge(current, following)
+                if(e < 0):
+                    break
+                chain.append(e)
+                previous, current = current, following
+            if current not in is_branch or current == u:
+                continue
+
+            length = int(graph.lengths[chain].sum())
+            if (u, current) not in merged or length > merged[(u, current)][1]:
+                merged[(u, current)] = (first, length, chain)
+
+    nodes = np.array(sorted(branch), dtype=np.int64)
+    new_id = {u: i for i, u in enumerate(nodes.tolist())}
+
+    # keep the edges in their original order, which groups them by source node
+    edges = sorted(merged.items(), key=lambda item: item[1][0])
+    sources = np.array([new_id[u] for (u, v), e in edges], dtype=np.int64)
+    targets = np.array([new_id[v] for (u, v), e in edges], dtype=np.int64)
+    lengths = np.array([e[1] for (u, v), e in edges], dtype=np.int64)
+
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(sources, minlength=len(nodes)))
+    path_offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+    path_offsets[1:] = np.cumsum(lengths)
+    chains = [graph.edge_path(e) for (u, v), (first, length, chain) in edges for e in chain]
+    pixel_type = location_id_dtype(*shape)
+    path_pixels = np.concatenate(chains).astype(pixel_type) if chains else np.zeros(0, dtype=pixel_type)
+
+    return Graph(graph.location_ids[nodes], graph.heuristic_info[nodes], offsets, targets, lengths, path_offsets, path_pixels, graph.width)
+
+
+
+
+def reduce_graph(tree, maze_array):
+
+    """
+    Removes every node and edge that cannot be on a simple path from the start to the end. The longest path of the
+    reduced graph is the longest path of the original one, and its pixel paths are the original corridors joined up.
+
+    Arguments:
+    - Tree or Graph of nodes built from maze
+    - Maze in array form
+
+    Returns:
+    - Reduced Graph
+    - Dictionary with the size of the graph after each stage and the number of bridges and components
+    """
+
+    graph = as_graph(tree, maze_array)
+    neighbours = undirected_neighbours(graph)
+    stats = {'nodes': graph.num_nodes, 'edges': graph.num_edges}
+
+    keep = prune_dead_ends(graph, neighbours)
+    stats['nodes_after_dead_ends'] = int(keep.sum())
+
+    components, bridges = biconnected_components(neighbours, keep, graph.start)
+    chain = blocks_between(components, graph.start, graph.end)
+    stats['components'] = len(components)
+    stats['bridges'] = len(bridges)
+    stats['components_on_path'] = len(chain)
+
+    keep = np.zeros(graph.num_nodes, dtype=bool)
+    keep[[graph.start, graph.end]] = True
+    for i in chain:
+        keep[components[i]] = True
+    stats['nodes_after_components'] = int(keep.sum())
+
+    reduced = contract_chains(graph, keep, neighbours, maze_array.shape)
+    stats['reduced_nodes'] = reduced.num_nodes
+    stats['reduced_edges'] = reduced.num_edges
+
+    return reduced, stats
+
+
+
+
+def print_reduction(stats):
+
+    """
+    Prints how much smaller the reduced graph is.
+
+    Arguments:
+    - Dictionary returned by reduce_graph
+    """
+
+    print("Nodes: {nodes} -> {nodes_after_dead_ends} without dead ends -> {nodes_after_components} in the {components_on_path} of {components} components between start and end ({bridges} bridges)".format(**stats))
+    print("Reduced graph: {reduced_nodes} nodes ({:.1%}), {reduced_edges} edges ({:.1%})".format(stats['reduced_nodes']/stats['nodes'], stats['reduced_edges']/max(stats['edges'], 1), **stats))
+
+
+
+
+def main():
+
+    """
+    Reports how much smaller the graph of a given maze gets.
+
+    """
+
+    filename = sys.argv[1] if len(sys.argv) > 1 else 'Mazes/Small-Medium1.bmp'
+    maze_array = np.array(Image.open(filename).point(lambda p: p > 128 and 1))
+    g = Graph.from_tree(Tree(maze_array), maze_array)
+    reduced, stats = reduce_graph(g, maze_array)
+    print_reduction(stats)
+
+
+if __name__ == "__main__":
+    main()
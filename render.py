@@ -0,0 +1,135 @@
+import numpy as np
+from PIL import Image
+
+
+# rendering of maze results, shared by both solvers
+# images are built with whole-array operations on the flattened pixel ids
+
+
+
+
+def maze_image(maze_array):
+
+    """
+    Converts the maze to an RGB image with white corridors and black walls.
+
+    Arguments:
+    - Maze in array form
+
+    Returns:
+    - RGB image as a (rows x cols x 3) uint8 array
+    """
+
+    grey = np.where(np.asarray(maze_array, dtype=bool), 255, 0).astype(np.uint8)
+
+    return np.repeat(grey[:, :, None], 3, axis=2)
+
+
+
+
+def path_colours(path_length, colour=(255, 0, 0), end_colour=None):
+
+    """
+    Colours for every pixel of a path - a single colour, or a gradient from the start colour to the end colour.
+
+    Arguments:
+    - Number of pixels on the path
+    - RGB colour of the path (of the start of the path if end_colour is given)
+    - RGB colour of the end of the path (optional)
+
+    Returns:
+    - (path length x 3) uint8 array of colours
+    """
+
+    if end_colour is None:
+        return np.broadcast_to(np.array(colour, dtype=np.uint8), (path_length, 3))
+
+    fraction = np.linspace(0, 1, path_length)[:, None]
+
+    return np.round((1 - fraction)*np.array(colour) + fraction*np.array(end_colour)).astype(np.uint8)
+
+
+
+
+def pheromone_heat_map(image, graph, strength=0.8):
+
+    """
+    Overlays the pheromone on every edge of the graph as a heat map, from blue (least) to red (most).
+
+    Arguments:
+    - RGB image to draw on (modified in place)
+    - Graph built from the maze, with its current pheromone
+    - Opacity of the overlay between 0 and 1
+    """
+
+    pixels = image.reshape(-1, 3)
+
+    # both directions of a corridor cover the same pixels - keep the larger pheromone
+    pheromone = np.zeros(len(pixels))
+    np.maximum.at(pheromone, graph.path_pixels, np.repeat(graph.pheromone, graph.lengths))
+
+    covered = np.flatnonzero(pheromone > 0)
+    level = np.log1p(pheromone[covered])
+    level = (level - level.min())/max(level.max() - level.min(), 1e-12)
+
+    heat = np.stack([255*level, np.zeros_like(level), 255*(1 - level)], axis=1)
+    pixels[covered] = np.round((1 - strength)*pixels[covered] + strength*heat).astype(np.uint8)
+
+
+
+
+def render_path(maze_array, best_path, colour=(255, 0, 0), end_colour=None, graph=None):
+
+    """
+    Draws the path on the maze.
+
+    Arguments:
+    - Maze in array form
+    - Path, specified using pixel location ids
+    - RGB colour of the path (of the start of the path if end_colour is given)
+    - RGB colour of the end of the path, for a gradient along the path (optional)
+    - Graph whose pheromone is drawn underneath the path as a heat map (optional)
+
+    Returns:
+    - RGB image as a (rows x cols x 3) uint8 array
+    """
+
+    image = maze_image(maze_array)
+
+    if graph is not None:
+        pheromone_heat_map(image, graph)
+
+    best_path = np.asarray(best_path, dtype=np.int64)
+    image.reshape(-1, 3)[best_path] = path_colours(len(best_path), colour, end_colour)
+
+    return image
+
+
+
+
+def draw_path(maze_array, best_path, filename, suffix, save_png=False, colour=(255, 0, 0), end_colour=None, graph=None):
+
+    """
+    Draws longest path found on original maze image and saves it next to the name of the maze.
+
+    Arguments:
+    - Maze in array form
+    - Longest path found, specified using pixel location ids
+    - Filename of original maze
+    - Suffix added to the maze name, e.g. _result_AS
+    - Whether to also save a 300 dpi png
+    - RGB colour of the path (of the start of the path if end_colour is given)
+    - RGB colour of the end of the path, for a gradient along the path (optional)
+    - Graph whose pheromone is drawn as a heat map (optional)
+
+    """
+
+    # convert to RGB format and the save as bmp file
+    filename_results = filename[:-4] + suffix + ".bmp"
+    print(filename_results)
+
+    pil = Image.fromarray(render_path(maze_array, best_path, colour, end_colour, graph))
+    pil.save(filename_results)
+
+    if save_png:
+        pil.save(filename[:-4] + suffix + ".png", dpi=(300, 300))
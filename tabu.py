@@ -0,0 +1,67 @@
+import numpy as np
+
+
+# tabu list class
+# one row of bits per ant, indexed by dense node id, packed into 64 bit words
+
+
+class TabuBitset():
+
+
+    def __init__(self, num_rows, num_nodes):
+        self.num_rows = num_rows
+        self.num_nodes = num_nodes
+        self.words = np.zeros((num_rows, (num_nodes + 63) >> 6), dtype=np.uint64)
+
+
+
+    def contains(self, rows, nodes):
+
+        """
+        Checks whether each node is on the tabu list of the matching row. Rows and nodes are broadcast against each other.
+
+        Arguments:
+        - Row (ant) indices
+        - Dense node ids
+
+        Returns:
+        - Boolean array, True where the node has been visited
+        """
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        bits = self.words[rows, nodes >> 6] >> (nodes & 63).astype(np.uint64)
+
+        return (bits & np.uint64(1)).astype(bool)
+
+
+
+    def add(self, rows, nodes):
+
+        """
+        Adds each node to the tabu list of the matching row.
+
+        Arguments:
+        - Row (ant) indices
+        - Dense node ids
+        """
+
+        nodes = np.asarray(nodes, dtype=np.int64)
+        np.bitwise_or.at(self.words, (rows, nodes >> 6), np.uint64(1) << (nodes & 63).astype(np.uint64))
+
+
+
+    def reset(self, rows=None, nodes=None):
+
+        """
+        Empties the tabu lists. If the visited nodes are given only the words holding them are cleared.
+
+        Arguments:
+        - Row (ant) indices of visited nodes (optional)
+        - Dense node ids of visited nodes (optional)
+        """
+
+        if rows is None:
+            self.words.fill(0)
+            return
+
+        self.words[rows, np.asarray(nodes, dtype=np.int64) >> 6] = 0
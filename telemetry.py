@@ -0,0 +1,203 @@
+import json
+import time
+import numpy as np
+
+
+# instrumentation for the ant system
+# colony_iterations marks the end of every phase of an iteration and construct_ant_paths counts the moves, backtracks
+# and ants that gave up - at the end of the iteration one record is handed to every callback (in-memory recorder,
+# JSON lines file, console)
+# with no Telemetry passed in, the solvers skip all of it, so a plain run pays nothing for it
+
+
+PHASES = ['construction', 'deposit', 'evaporation']
+
+
+
+
+def pheromone_entropy(pheromone):
+
+    """
+    Shannon entropy of the pheromone spread over the edges, divided by its largest possible value. 1 means every edge
+    has the same pheromone, values near 0 mean it has built up on a few edges (the colony has converged).
+
+    Arguments:
+    - Pheromone of every edge
+
+    Returns:
+    - Normalised entropy between 0 and 1
+    """
+
+    if(len(pheromone) < 2):
+        return 0.0
+
+    p = np.asarray(pheromone, dtype=np.float64)
+    p = p[p > 0]/p.sum()
+
+    return float(-(p*np.log(p)).sum()/np.log(len(pheromone)))
+
+
+
+
+class Telemetry():
+
+
+    def __init__(self, *callbacks, entropy=True):
+        self.callbacks = list(callbacks) # called with the record of every iteration
+        self.entropy = entropy # pheromone entropy costs a pass over all edges per iteration
+        self.iteration = 0
+        self.counters = {}
+        self.totals = {} # counters and phase times summed over all iterations
+        self.phase_times = {}
+        self.last_mark = None
+
+
+
+    def add_callback(self, callback):
+
+        self.callbacks.append(callback)
+
+
+
+    def count(self, name, n=1):
+
+        """
+        Adds to a counter of the current iteration.
+
+        Arguments:
+        - Counter name
+        - Amount added
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+
+
+    def start_iteration(self):
+
+        self.counters = {'moves': 0, 'backtracks': 0, 'abandoned': 0}
+        self.phase_times = {}
+        self.last_mark = time.perf_counter()
+
+
+
+    def mark(self, phase):
+
+        """
+        Ends a phase - the time since the previous mark (or the start of the iteration) is added to it.
+
+        Arguments:
+        - Phase name
+        """
+
+        now = time.perf_counter()
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+
+
+    def end_iteration(self, graph, best_path_length, path_lengths):
+
+        """
+        Builds the record of the iteration and hands it to every callback.
+
+        Arguments:
+        - Graph built from maze
+        - Full length of best path found so far, specified in terms of pixel ids
+        - Full length of each ant's path in this iteration
+
+        Returns:
+        - Record of the iteration
+        """
+
+        record = {'iteration': self.iteration, 'seconds': {phase: round(t, 6) for phase, t in self.phase_times.items()}}
+        record.update(self.counters)
+        record['best_length'] = int(best_path_length)
+        record['iteration_best_length'] = int(np.max(path_lengths)) if len(path_lengths) > 0 else 0
+        record['mean_length'] = float(np.mean(path_lengths)) if len(path_lengths) > 0 else 0.0
+        if self.entropy:
+            record['pheromone_entropy'] = pheromone_entropy(graph.pheromone)
+
+        for name, n in self.counters.items():
+            self.totals[name] = self.totals.get(name, 0) + n
+        for phase, t in self.phase_times.items():
+            self.totals[phase + '_seconds'] = self.totals.get(phase + '_seconds', 0.0) + t
+
+        for callback in self.callbacks:
+            callback(record)
+        self.iteration += 1
+
+        return record
+
+
+
+
+class Recorder():
+
+
+    def __init__(self):
+        self.records = [] # one record per iteration
+
+
+
+    def __call__(self, record):
+
+        self.records.append(record)
+
+
+
+    def column(self, name):
+
+        """
+        One field of every record, e.g. recorder.column('best_length') for the convergence curve.
+
+        Arguments:
+        - Field name
+
+        Returns:
+        - List of values, one per iteration
+        """
+
+        return [record.get(name) for record in self.records]
+
+
+
+
+class JsonLinesWriter():
+
+
+    def __init__(self, file):
+        self.owned = isinstance(file, str) # only close files opened here
+        self.file = open(file, 'w') if self.owned else file
+
+
+
+    def __call__(self, record):
+
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush() # readable while the run is still going
+
+
+
+    def close(self):
+
+        if self.owned:
+            self.file.close()
+
+
+
+
+def print_record(record):
+
+    """
+    Prints one line per iteration - the console callback used by the command line entry points.
+
+    Arguments:
+    - Record of an iteration
+    """
+
+    seconds = ", ".join("{} {:.3f}s".format(phase, record['seconds'][phase]) for phase in PHASES if phase in record['seconds'])
+    line = "Iteration {}: best {}, iteration best {}, {} moves, {} backtracks, {}".format(record['iteration'], record['best_length'], record['iteration_best_length'], record['moves'], record['backtracks'], seconds)
+    if 'pheromone_entropy' in record:
+        line += ", pheromone entropy {:.6f}".format(record['pheromone_entropy'])
+    print(line)
@@ -0,0 +1,105 @@
+import contextlib
+import io
+import numpy as np
+import pytest
+from tree import Tree
+from graph import Graph
+from maze_generator import generate_maze
+from exact_solver import bitmask_dp, branch_and_bound
+
+
+# exact solver checked against brute force enumeration of every simple path on small generated mazes with loops
+
+
+
+
+def build_graph(size, seed, loops=0.3):
+
+    """
+    Builds the graph of a small generated maze (with loops, so there is more than one path to choose from).
+
+    Arguments:
+    - Height and width in pixels
+    - Random seed
+    - Loop density
+
+    Returns:
+    - Maze in array form
+    - Graph built from maze
+    """
+
+    maze_array = np.asarray(generate_maze(size, size, loops, seed)).astype(np.uint8)
+    with contextlib.redirect_stdout(io.StringIO()): # Tree prints its progress
+        graph = Graph.from_tree(Tree(maze_array), maze_array)
+
+    return maze_array, graph
+
+
+
+def brute_force_longest(graph):
+
+    """
+    Longest simple path from start to end by trying every simple path.
+
+    Arguments:
+    - Graph built from maze
+
+    Returns:
+    - Full length of the longest path (pixels), 0 if the end cannot be reached
+    """
+
+    best = 0
+    stack = [(graph.start, 1, 1 << graph.start)]
+    while stack:
+        node, length, visited = stack.pop()
+        if(node == graph.end):
+            best = max(best, length)
+            continue
+        for edge in graph.edge_ids(node):
+            v = int(graph.targets[edge])
+            if not (visited >> v) & 1:
+                stack.append((v, length + int(graph.lengths[edge]), visited | (1 << v)))
+
+    return best
+
+
+
+def path_length(graph, path):
+
+    """
+    Full length of a path given in node ids, checking that it is a simple path along edges of the graph.
+
+    """
+
+    assert path[0] == graph.start and path[-1] == graph.end
+    assert len(set(path)) == len(path)
+    edges = graph.find_edges(np.asarray(path[:-1], dtype=np.int64), path[1:])
+    assert np.all(edges >= 0)
+
+    return 1 + int(graph.lengths[edges].sum())
+
+
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_bitmask_dp_matches_brute_force(seed):
+
+    maze_array, graph = build_graph(9, seed)
+    assert graph.num_nodes <= 18
+
+    path, length = bitmask_dp(graph)
+
+    assert length == brute_force_longest(graph)
+    assert path_length(graph, path) == length
+
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_branch_and_bound_matches_brute_force(seed):
+
+    maze_array, graph = build_graph(13, seed)
+
+    path, length, upper_bound = branch_and_bound(graph, time_budget=60.0)
+
+    assert length == upper_bound == brute_force_longest(graph)
+    assert path_length(graph, path) == length
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from reduction import reduce_graph
+from exact_solver import exact_longest_path
+from test_exact_solver import build_graph, brute_force_longest, path_length
+
+
+# graph reduction checked against brute force - the longest simple path must be the same before and after reducing,
+# and it must still be a contiguous pixel path from the entrance to the exit
+
+
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_reduction_keeps_longest_path(seed):
+
+    maze_array, graph = build_graph(13, seed)
+
+    reduced, stats = reduce_graph(graph, maze_array)
+
+    assert reduced.num_nodes <= graph.num_nodes
+    assert brute_force_longest(reduced) == brute_force_longest(graph)
+
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_reduced_paths_are_contiguous(seed):
+
+    maze_array, graph = build_graph(13, seed)
+    reduced, stats = reduce_graph(graph, maze_array)
+    w = maze_array.shape[1]
+
+    # follow the longest path of the reduced graph (by brute force) and check every pixel step
+    best_path, best_length = [], 0
+    stack = [[reduced.start]]
+    while stack:
+        path = stack.pop()
+        if(path[-1] == reduced.end):
+            full_path = [pixel for part in reduced.build_full_path(reduced.location_ids[path].tolist()) for pixel in part]
+            if(len(full_path) > best_length):
+                best_path, best_length = full_path, len(full_path)
+            continue
+        for edge in reduced.edge_ids(path[-1]):
+            v = int(reduced.targets[edge])
+            if v not in path:
+                stack.append(path + [v])
+
+    pixels = np.array(best_path)
+    rows, cols = pixels // w, pixels % w
+    assert best_length == brute_force_longest(graph)
+    assert len(set(best_path)) == len(best_path)
+    assert np.all(np.abs(np.diff(rows)) + np.abs(np.diff(cols)) == 1)
+    assert np.all(maze_array[rows, cols] == 1)
+    assert rows[0] == 0 and rows[-1] == maze_array.shape[0] - 1
+
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_exact_longest_path_on_reduced_graph(seed):
+
+    maze_array, graph = build_graph(13, seed)
+
+    path, length, upper_bound, reduced = exact_longest_path(graph, maze_array, reduce=True)
+
+    assert length == upper_bound == brute_force_longest(graph)
+    assert path_length(reduced, [reduced.node_id(location) for location in path]) == length
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+# transition weight cache
+# the heuristic factor heuristic_info**beta of every edge is fixed for a run, the pheromone factor changes only in the
+# pheromone updates between iterations - so the weights are computed once per iteration, not once per move
+
+
+class TransitionCache():
+
+
+    def __init__(self, graph, alpha, beta):
+        self.graph = graph
+        self.alpha = alpha
+        self.heuristic_power = np.power(graph.heuristic_info[graph.targets], beta) # edge id -> heuristic factor of its target
+        self.weights = None # edge id -> pheromone**alpha * heuristic**beta
+
+
+
+    def refresh(self):
+
+        """
+        Recomputes the weight of every edge from the current pheromone.
+
+        """
+
+        self.weights = np.power(self.graph.pheromone, self.alpha)*self.heuristic_power
+
+
+
+    def probabilities(self, candidate_edges, valid):
+
+        """
+        Calculates the cumulative probabilities of moving along each candidate edge, from the cached edge weights.
+
+        Arguments:
+        - Candidate edges for each ant (ants x max out-degree), padded with -1
+        - Mask of candidates that are not padding and not on the ant's tabu list
+
+        Returns:
+        - Cumulative transition probabilities for each ant (ants x max out-degree)
+        """
+
+        weights = self.weights[candidate_edges]
+        weights[~valid] = 0
+        transition_sum = weights.sum(axis=1, keepdims=True) # find sum of probabilities
+
+        # if every option has zero weight (e.g. only the exit is left) take the first valid option
+        no_weight = (transition_sum[:, 0] == 0)
+        weights[no_weight] = 0
+        weights[no_weight, np.argmax(valid[no_weight], axis=1)] = 1
+        transition_sum[no_weight] = 1
+
+        return np.cumsum(weights, axis=1)/transition_sum
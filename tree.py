@@ -1,4 +1,27 @@
+import gc
+from array import array
 import numpy as np 
+from packed_maze import PackedMaze
+
+
+
+
+def location_id_dtype(h, w):
+
+    """
+    Smallest integer type that holds every pixel location id (r*w + c) of a maze.
+
+    Arguments:
+    - Height of maze
+    - Width of maze
+
+    Returns:
+    - np.int32, or np.int64 for mazes of 2**31 pixels or more
+    """
+
+    return np.int32 if h*w < 2**31 else np.int64
+
+
 
 
 # tree class
@@ -14,7 +37,7 @@ class Node():
         self.children= {} # dictionary dest node id: distance
         self.discovered = False
         self.parent = None
-        self.paths = {} # dictionary with dest node id: path
+        self.paths = {} # dictionary with dest node id: path (view into the tree's packed path buffer)
         self.pheromone = {} # dictionary with dest node id (location id): pheromone 
 
     
@@ -28,7 +51,7 @@ class Node():
 class Tree():
 
 
-    def __init__(self, maze_array):
+    def __init__(self, maze_array, build_paths=True):
         self.root = None
         self.nodes = {} # also good to keep a list of nodes - quicker access
         self.num_nodes = 0
@@ -36,10 +59,10 @@ class Tree():
         self.start_location = [-1, -1]
         self.end_location = [-1, -1]
         self.largest_distance = -1
-        self.pixel_routes = {}
 
-        self.create_nodes(maze_array) # don't build paths upfront
-        #self.tree_from_maze(maze_array) # if building tree upfront
+        self.create_nodes(maze_array)
+        if build_paths: # can be left to a separate tree_from_maze call, e.g. to time the two steps on their own
+            self.tree_from_maze(maze_array) # build all paths upfront
 
 
     
@@ -115,15 +138,6 @@ class Tree():
                 self.num_nodes +=1
                 #parent_id = node_id # will this be separate?
                 #node_id = node_id + 1
-                possible_locations = [[r-1, c], [r, c+1], [r+1, c], [r, c-1]]
-                num_routes = 0
-                routes = []
-                for i in range(4):
-                    loc= possible_locations[i]
-                    if(maze_array[loc[0]][loc[1]] == True):
-                        num_routes += 1
-                        routes.append(loc)
-                self.pixel_routes[location_id] = routes
         
 
 
@@ -176,20 +190,15 @@ class Tree():
         [r, c] = node_location
         possible_locations = [[r-1, c], [r, c+1], [r+1, c], [r, c-1]]
         num_routes = 0
-        routes = []
         for i in range(4):
             loc= possible_locations[i]
-            if(maze_array[loc[0]][loc[1]] == True):
+            if(maze_array[loc[0], loc[1]] == True):
                 num_routes += 1
-                routes.append(loc)
         
         #print(num_routes)
         if(num_routes > 2):
             is_node = True
 
-        location_id = r*len(maze_array[0]) + c
-        self.pixel_routes[location_id] = routes
-
         return is_node
 
 
@@ -205,8 +214,128 @@ class Tree():
 
 
     
+    def count_open_neighbours(self, maze_array):
+
+        """
+        Counts the open 4-neighbours (up, right, down, left) of every pixel using shifted copies of the maze.
+
+        Arguments:
+        - Maze in array form
+
+        Returns:
+        - Boolean maze and neighbour counts
+        """
+
+        open_cells = np.asarray(maze_array, dtype=bool)
+
+        # pad with walls so that pixels on the border see a wall rather than wrapping around
+        padded = np.zeros((open_cells.shape[0] + 2, open_cells.shape[1] + 2), dtype=bool)
+        padded[1:-1, 1:-1] = open_cells
+
+        # same order as check_num_directions: up, right, down, left
+        num_routes = np.zeros(open_cells.shape, dtype=np.uint8)
+        for neighbour in [padded[:-2, 1:-1], padded[1:-1, 2:], padded[2:, 1:-1], padded[1:-1, :-2]]:
+            num_routes += neighbour
+
+        return open_cells, num_routes
+
+
+
+    def find_junctions_tiled(self, maze, tile_rows=1024):
+
+        """
+        Finds the junctions (open interior pixels with more than two open neighbours) of a bit-packed maze, one tile of
+        rows at a time. The neighbours are counted on the packed bits, so only the junctions themselves are unpacked.
+
+        Arguments:
+        - Bit-packed maze
+        - Number of rows per tile
+
+        Returns:
+        - Rows and columns of the junctions, in row-major order
+        """
+
+        h, w = maze.shape
+        all_rows = []
+        all_cols = []
+
+        for start in range(1, h - 1, tile_rows): # interior rows only
+            stop = min(start + tile_rows, h - 1)
+            rows, cols = np.nonzero(np.unpackbits(maze.junction_bits(start, stop), axis=1, count=w))
+            all_rows.append(rows + start)
+            all_cols.append(cols)
+
+        if not all_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(all_rows), np.concatenate(all_cols)
+
+
+
     def create_nodes(self, maze_array):
 
+        """
+        Creates a node for the entrance, the exit and every junction (open pixel with more than two open neighbours).
+        Produces the same nodes and heuristics as create_nodes_loop using whole-array operations.
+        A bit-packed maze is processed a tile of rows at a time.
+
+        Arguments:
+        - Maze in array form or PackedMaze
+        """
+
+        self.create_root_node(maze_array)
+
+        if isinstance(maze_array, PackedMaze):
+            rows, cols = self.find_junctions_tiled(maze_array)
+            width = maze_array.shape[1]
+        else:
+            open_cells, num_routes = self.count_open_neighbours(maze_array)
+            width = open_cells.shape[1]
+
+            # interior rows only - entrance and exit are handled separately
+            interior = np.zeros_like(open_cells)
+            interior[1:-1] = open_cells[1:-1]
+            junctions = interior & (num_routes > 2)
+
+            # junctions in row-major order so node ids match the loop version
+            rows, cols = np.nonzero(junctions)
+
+        [end_r, end_c] = self.end_location
+        heuristics = np.sqrt(np.square(rows - end_r, dtype=float) + np.square(cols - end_c, dtype=float))
+        location_ids = rows*width + cols
+
+        # a node object per junction is created below - the cyclic garbage collector would rescan them repeatedly
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            node_id = 1
+            for r, c, location_id, heuristic in zip(rows.tolist(), cols.tolist(), location_ids.tolist(), heuristics):
+                self.nodes[location_id] = Node(node_id, location_id, [r, c], heuristic) # add to list of nodes - indexed by location id
+                node_id = node_id + 1
+
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        # add end node manually
+        heuristic = self.calculate_heuristic(self.end_location)
+        location_id = self.end_location[0]*width + self.end_location[1]
+        self.nodes[location_id] = Node(node_id, location_id, self.end_location, heuristic) # add to list of nodes
+
+        print("Finished creating nodes")
+
+
+
+    def create_nodes_loop(self, maze_array):
+
+        """
+        Reference version of create_nodes that checks every pixel in turn. Kept for verifying the vectorised version.
+
+        Arguments:
+        - Maze in array form
+        """
+
 
         self.create_root_node(maze_array)
 
@@ -218,7 +347,7 @@ class Tree():
         for r in range(1, len(maze_array)-1): # have already created node for entrance
             for c in range(len(maze_array[0])):
                 loc = [r, c]
-                if (maze_array[loc[0]][loc[1]] == True):
+                if (maze_array[loc[0], loc[1]] == True):
                     if(self.check_num_directions(maze_array, loc) == True):
                         #self.add_node(node_id, [r, c])
                         #print("new node")
@@ -238,7 +367,6 @@ class Tree():
         #print(location_id)
         child = Node(node_id, location_id, self.end_location, heuristic)
         self.nodes[location_id] = child # add to list of nodes
-        self.pixel_routes[location_id] = [] # end
 
         print("Finished creating nodes")
 
@@ -250,118 +378,195 @@ class Tree():
 
     def find_paths(self, location_id, valid_routes_outer, maze_array, tabu_list):
 
+        """
+        Looks up the children of the given node. All paths are found upfront by tree_from_maze.
+
+        Arguments:
+        - Location id of the node
+        - Pixel routes leaving the node (unused, kept for compatibility)
+        - Maze in array form (unused, kept for compatibility)
+        - Location ids that should not be returned as children
+
+        Returns:
+        - Location ids of the children and the location id of the pixel just before each child
+        """
 
-        #tabu_list = [location_id]
         children = []
         lasts = []
-        for i in range(len(valid_routes_outer)):
-
-            node_not_found = True
-
-            [r, c] = valid_routes_outer[i]
-            #print([r, c])
-            route_id = r*len(maze_array[0]) + c
-
-            path = [route_id] # not sure where to intialize
-
-            # check for node (i.e. this child is already a node)
-            if(route_id in self.nodes):
-                #print('node found!')
-                self.nodes[location_id].paths[route_id] = path  # potentially create an edge for each path for ant system
-                self.nodes[location_id].children[route_id] = len(path) # check this
-                self.nodes[location_id].pheromone[route_id] = 1 # init with small amount of pheromone
-                children.append(route_id)
-                lasts.append(location_id) #element just before
-                node_not_found = False
-
-            tabu_list.append(route_id)
-            # loop until node is found - track this path
-            while(node_not_found == True):
-
-                new_routes = self.pixel_routes[route_id]
-                #print(new_routes)
-                valid_routes = [n for n in new_routes if (n[0]*len(maze_array[0]) + n[1]) not in tabu_list]
-                
-                if(len(valid_routes) == 0):
-                    #print("probably stuck in loop")
-                    break
-
-                if(len(valid_routes) > 1):
-                    print("many- shouldnt be?")
-
-                # check for node
-                [r, c] = valid_routes[0]
-                #print([r, c])
-                route_id = r*len(maze_array[0]) + c
-                path.append(route_id)
-                if(route_id in self.nodes):
-                    #print('node found!')
-                    #print(route_id)
-                    #print(path)
-                    # store path to this node
-                    self.nodes[location_id].paths[route_id] = path  # potentially create an edge for each path for ant system
-                    self.nodes[location_id].children[route_id] = len(path) # check this
-                    self.nodes[location_id].pheromone[route_id] = 1 # init with small amount of pheromone
-                    children.append(route_id)
-                    lasts.append(path[-2]) #not sure what to add for this?
-                    node_not_found = False
-                tabu_list.append(route_id)
-        
+        vertex = self.nodes[location_id]
+        for child_id, path in vertex.paths.items():
+            if(child_id in tabu_list):
+                continue
+            children.append(child_id)
+            lasts.append(location_id if len(path) == 1 else int(path[-2])) # element just before
+
         return children, lasts
 
 
 
-    
 
 
 
-    def tree_from_maze(self, maze_array):
+    def padded_open_bits(self, maze_array, padded_width, tile_rows=1024):
 
-        self.create_nodes(maze_array)
-        print("Finished creating nodes")
-        print("Number of nodes: {}".format(len(self.nodes)))
+        """
+        Packs the maze into one bit per pixel with a border of walls, a tile of rows at a time. Rows are padded to a
+        whole number of bytes, so pixel p of the padded maze is bit 7 - p%8 of byte p//8.
 
-        [r, c] = self.start_location
-        print(r, c)
-        parent_location_id = r*len(maze_array[0]) + c
+        Arguments:
+        - Maze in array form or PackedMaze
+        - Width of the padded rows (a multiple of 8, at least the maze width + 2)
+        - Number of rows per tile
 
-        queue = [parent_location_id]
-        previous = [parent_location_id]
-        visited = [parent_location_id]
+        Returns:
+        - Packed bits of the padded maze
+        """
 
-        while(len(queue) > 0):
+        h, w = maze_array.shape
+        row_bytes = padded_width//8
+        bits = bytearray(row_bytes) # wall row above the maze
 
-            #print(len(queue))
-            location_id = queue.pop(0)
-            #print("Current node: {}".format(location_id))
-            tabu_list = [parent_location_id, previous.pop(0), location_id] # previous and current pixels 
-            #print("Tabu list: {}".format(tabu_list))
+        for start in range(0, h, tile_rows):
+            stop = min(start + tile_rows, h)
+            band = np.zeros((stop - start, padded_width), dtype=bool)
+            band[:, 1:w + 1] = maze_array.rows(start, stop) if isinstance(maze_array, PackedMaze) else np.asarray(maze_array[start:stop], dtype=bool)
+            bits += np.packbits(band, axis=1).tobytes()
 
-            # 1. Identify potential directions - remove parent direction/tabu list and direction you just came from
-            routes = self.pixel_routes[location_id]
-            #print(routes)
+        bits += bytearray(row_bytes) # wall row below the maze
 
-            valid_routes_outer = [n for n in routes if (n[0]*len(maze_array[0]) + n[1]) not in tabu_list]
-            #print(valid_routes_outer)
+        return bits
 
-            visited.append(location_id)
 
 
-            children, lasts = self.find_paths(location_id, valid_routes_outer, maze_array, tabu_list)
+    def tree_from_maze(self, maze_array):
 
-            for i in range(len(children)):
-                #print(location_id)
-                #print(self.nodes[location_id].children)
-                if(children[i] not in visited):
-                    queue.append(children[i])
-                    previous.append(lasts[i])
-                    self.nodes[location_id].children[children[i]] = 1
-            
+        """
+        Finds the paths between all nodes in a single sweep over the maze pixels.
+        Each corridor is walked once (a visited bitmap stops it being walked again from its other end) and gives the edges in both directions.
+        Edges never lead back into the entrance or out of the exit, matching the paths the solvers used to discover at run-time.
+        The maze is only held as packed bits during the sweep, so it needs a bit per pixel for the maze and another for visited.
 
-        
-        
-        
-        
-                
+        Arguments:
+        - Maze in array form or PackedMaze
+        """
 
-            
\ No newline at end of file
+        if not isinstance(maze_array, PackedMaze):
+            maze_array = np.asarray(maze_array, dtype=bool)
+        h, w = maze_array.shape
+
+        # work on pixel ids of a wall-padded maze so that no bounds checks are needed
+        padded_width = ((w + 2 + 7)//8)*8
+        is_open = self.padded_open_bits(maze_array, padded_width)
+        visited = bytearray(len(is_open))
+        masks = (128, 64, 32, 16, 8, 4, 2, 1) # bit of pixel p is is_open[p >> 3] & masks[p & 7]
+
+        vertices = sorted(self.nodes.values(), key=lambda n: n.id)
+        node_pixels = [(n.location[0] + 1)*padded_width + n.location[1] + 1 for n in vertices]
+        node_index = {pixel: i for i, pixel in enumerate(node_pixels)}
+
+        start = 0
+        end = len(vertices) - 1
+        steps = (-padded_width, 1, padded_width, -1) # up, right, down, left - same order as check_num_directions
+        interior_start = 2*padded_width # first pixel of maze row 1
+        interior_stop = h*padded_width # first pixel of maze row h - 1
+
+        # candidate edges: source, destination, route index at the source (for ordering) and packed path
+        sources = array('i')
+        targets = array('i')
+        route_index = array('b')
+        path_starts = array('q')
+        pixel_type = 'i' if len(is_open)*8 < 2**31 else 'q' # padded pixel ids
+        pixels = array(pixel_type)
+
+        for u in range(end): # the exit has no paths leaving it
+            pixel = node_pixels[u]
+            for i in range(4):
+                first = pixel + steps[i]
+                if not is_open[first >> 3] & masks[first & 7]:
+                    continue
+
+                # child is directly next to this node
+                v = node_index.get(first, -1)
+                if v >= 0:
+                    if v != start:
+                        sources.append(u); targets.append(v); route_index.append(i); path_starts.append(len(pixels))
+                        pixels.append(first)
+                    continue
+
+                # corridor already walked from its other end
+                if visited[first >> 3] & masks[first & 7]:
+                    continue
+
+                # follow the corridor until a node or dead end is found
+                corridor = [first]
+                visited[first >> 3] |= masks[first & 7]
+                previous = pixel
+                current = first
+                while True:
+                    # a corridor pixel away from the first and last row has at most one way on (otherwise it would be
+                    # a junction), so carrying straight on is tried first - in those two rows the route order decides
+                    following = 2*current - previous
+                    if not (interior_start <= current < interior_stop and is_open[following >> 3] & masks[following & 7]):
+                        following = -1
+                        for step in steps:
+                            candidate = current + step
+                            if candidate != previous and is_open[candidate >> 3] & masks[candidate & 7]:
+                                following = candidate
+                                break
+
+                    if following < 0: # dead end
+                        break
+
+                    v = node_index.get(following, -1)
+                    if v >= 0:
+                        if v == u: # corridor loops back to the same node
+                            break
+                        if v != start:
+                            sources.append(u); targets.append(v); route_index.append(i); path_starts.append(len(pixels))
+                            pixels.extend(corridor)
+                            pixels.append(following)
+                        if v != end and u != start:
+                            sources.append(v); targets.append(u); route_index.append(steps.index(current - following)); path_starts.append(len(pixels))
+                            pixels.extend(reversed(corridor))
+                            pixels.append(pixel)
+                        break
+
+                    visited[following >> 3] |= masks[following & 7]
+                    corridor.append(following)
+                    previous = current
+                    current = following
+
+        sources = np.frombuffer(sources, dtype=np.int32)
+        targets = np.frombuffer(targets, dtype=np.int32)
+        path_starts = np.frombuffer(path_starts, dtype=np.int64)
+        path_ends = np.append(path_starts[1:], len(pixels))
+
+        # order edges by source then route, keeping only the first path between any two nodes
+        order = np.lexsort((np.frombuffer(route_index, dtype=np.int8), sources))
+        _, first = np.unique(sources[order].astype(np.int64)*len(vertices) + targets[order], return_index=True)
+        order = order[np.sort(first)]
+
+        # gather the kept paths into one buffer, converting back to unpadded location ids
+        lengths = (path_ends - path_starts)[order]
+        path_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+        path_offsets[1:] = np.cumsum(lengths)
+        gather = np.repeat(path_starts[order] - path_offsets[:-1], lengths) + np.arange(path_offsets[-1])
+        padded_ids = np.frombuffer(pixels, dtype=np.int32 if pixel_type == 'i' else np.int64)[gather].astype(np.int64)
+        path_pixels = ((padded_ids // padded_width - 1)*w + padded_ids % padded_width - 1).astype(location_id_dtype(h, w))
+
+        self.edge_sources = sources[order]
+        self.edge_targets = targets[order]
+        self.edge_lengths = lengths.astype(np.int32)
+        self.path_offsets = path_offsets
+        self.path_pixels = path_pixels
+
+        # store the paths on the nodes - paths are views into the packed buffer
+        for e in range(len(order)):
+            vertex = vertices[self.edge_sources[e]]
+            child_id = vertices[self.edge_targets[e]].location_id
+            vertex.paths[child_id] = path_pixels[path_offsets[e]:path_offsets[e+1]]
+            vertex.children[child_id] = int(self.edge_lengths[e])
+            vertex.pheromone[child_id] = 1 # init with small amount of pheromone
+
+        print("Number of nodes: {}".format(len(vertices)))
+        print("Number of edges: {}".format(len(order)))